@@ -320,7 +320,9 @@ class TabHomeFrame(ctk.CTkFrame):
     
     def _setup_styles(self):
         """Настройка стилей."""
-        self.update_treeview_style(ctk.get_appearance_mode())
+        appearance_mode = ctk.get_appearance_mode()
+        self.update_treeview_style(appearance_mode)
+        self.update_context_menu_style(appearance_mode)
     
     def _bind_events(self):
         """Привязка событий."""
@@ -650,6 +652,7 @@ class TabHomeFrame(ctk.CTkFrame):
         )
         
         if confirm:
+            self.app.home_frame.prepare_tabs_change()
             self.app.home_frame.tabview.delete(current_tab)
             remaining_tabs = list(self.app.home_frame.tabview._tab_dict.keys())
             if remaining_tabs:
@@ -670,6 +673,8 @@ class TabHomeFrame(ctk.CTkFrame):
         if not new_name:
             return
         
+        # Проверка имени - только после создания всех вкладок из конфигурации
+        self.app.home_frame.prepare_tabs_change()
         if new_name in self.app.home_frame.tabview._tab_dict:
             self.app.show_error("Ошибка", "Вкладка с таким именем уже существует!")
             return
@@ -720,6 +725,24 @@ class TabHomeFrame(ctk.CTkFrame):
         except:
             pass
     
+    def update_context_menu_style(self, appearance_mode: str):
+        """Обновление цветов контекстного меню."""
+        if appearance_mode == "Dark":
+            bg = "#2e2e2e"
+            fg = "white"
+            active_bg = "#5f5f5f"
+        else:
+            bg = "white"
+            fg = "black"
+            active_bg = "#cfcfcf"
+        
+        self.context_menu.configure(
+            bg=bg,
+            fg=fg,
+            activebackground=active_bg,
+            activeforeground=fg
+        )
+    
     def get_treeview_column_widths(self, tree) -> Dict[str, int]:
         """Получение ширины колонок таблицы."""
         try:
@@ -876,8 +899,15 @@ class HomeFrame(ctk.CTkFrame):
         
         return tab_frame
     
+    def prepare_tabs_change(self):
+        """Завершение загрузки вкладок из конфигурации перед их изменением пользователем."""
+        settings_frame = getattr(self.app, 'settings_frame', None)
+        if settings_frame is not None:
+            settings_frame.prepare_tabs_change()
+    
     def add_new_tab(self):
         """Добавление новой вкладки."""
+        self.prepare_tabs_change()
         existing_tabs = list(self.tabview._tab_dict.keys())
         new_tab_number = 1
         
@@ -10,13 +10,49 @@ import json
 import os
 import sys
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from gui.home_frame import TabHomeFrame
 from utils.config import ConfigManager
 from utils.password_manager import PasswordManager
 
 logger = logging.getLogger(__name__)
 
+# Статические подписи виджетов настроек
+_L_TITLE = "Настройки"
+_L_SECTION_APPEARANCE = "🎨 Внешний вид"
+_L_SECTION_PASSWORD = "🔐 Управление паролем"
+_L_SECTION_USERS = "👥 Управление доступом"
+_L_SECTION_ADVANCED = "⚙️ Расширенные настройки"
+_L_SCALE = "Масштаб интерфейса:"
+_L_THEME = "Тема оформления:"
+_L_PASSWORD = "Пароль для AD:"
+_L_STORAGE = "Метод хранения:"
+_L_USERS = "Пользователи с доступом:"
+_L_LOG_LEVEL = "Уровень логирования:"
+
+# Значения по умолчанию для load_all_settings
+_LOAD_DEFAULTS: Dict[str, Any] = {
+    "ui_scaling": "100%",
+    "appearance_mode": "System",
+    "storage_method": "Credential Manager",
+    "autoload": True,
+    "autosave": True,
+    "log_level": "INFO",
+    "tabs": []
+}
+
+# Общие шрифты (создаются один раз при первом обращении)
+_FONTS: Dict[tuple, ctk.CTkFont] = {}
+
+
+def _get_font(size: int, weight: str = "normal") -> ctk.CTkFont:
+    """Получение общего объекта шрифта заданного размера."""
+    key = (size, weight)
+    font = _FONTS.get(key)
+    if font is None:
+        font = _FONTS[key] = ctk.CTkFont(size=size, weight=weight)
+    return font
+
 class SettingsFrame(ctk.CTkFrame):
     """Фрейм настроек приложения."""
     
@@ -34,6 +70,15 @@ class SettingsFrame(ctk.CTkFrame):
         self.config_manager = ConfigManager()
         self.password_manager = PasswordManager()
         
+        # Кэш примененной темы (для пропуска повторного применения)
+        self._current_appearance_mode: Optional[str] = None
+        
+        # Текущая поэтапная загрузка вкладок
+        self._tab_loader = None
+        
+        # Вкладки конфигурации, которые еще не созданы (или не удалось создать)
+        self._unrestored_tabs: List[Dict[str, Any]] = []
+        
         # Создание UI
         self._create_widgets()
         
@@ -50,8 +95,8 @@ class SettingsFrame(ctk.CTkFrame):
         # Заголовок
         self.title_label = ctk.CTkLabel(
             self.main_container, 
-            text="Настройки", 
-            font=ctk.CTkFont(size=24, weight="bold")
+            text=_L_TITLE, 
+            font=_get_font(24, "bold")
         )
         self.title_label.pack(pady=(0, 20))
         
@@ -70,7 +115,7 @@ class SettingsFrame(ctk.CTkFrame):
         section_label = ctk.CTkLabel(
             self.main_container,
             text=title,
-            font=ctk.CTkFont(size=18, weight="bold")
+            font=_get_font(18, "bold")
         )
         section_label.pack(anchor="w", pady=(20, 10))
         
@@ -82,7 +127,7 @@ class SettingsFrame(ctk.CTkFrame):
     
     def _create_appearance_section(self):
         """Создание секции настроек внешнего вида."""
-        frame = self._create_section_frame("🎨 Внешний вид")
+        frame = self._create_section_frame(_L_SECTION_APPEARANCE)
         
         # Масштабирование UI
         scaling_container = ctk.CTkFrame(frame, fg_color="transparent")
@@ -90,8 +135,8 @@ class SettingsFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             scaling_container, 
-            text="Масштаб интерфейса:",
-            font=ctk.CTkFont(size=14)
+            text=_L_SCALE,
+            font=_get_font(14)
         ).pack(side="left", padx=(0, 20))
         
         self.scaling_slider = ctk.CTkSlider(
@@ -106,7 +151,7 @@ class SettingsFrame(ctk.CTkFrame):
         self.scaling_label = ctk.CTkLabel(
             scaling_container,
             text="100%",
-            font=ctk.CTkFont(size=14)
+            font=_get_font(14)
         )
         self.scaling_label.pack(side="left")
         
@@ -116,8 +161,8 @@ class SettingsFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             theme_container,
-            text="Тема оформления:",
-            font=ctk.CTkFont(size=14)
+            text=_L_THEME,
+            font=_get_font(14)
         ).pack(side="left", padx=(0, 20))
         
         self.appearance_mode_menu = ctk.CTkSegmentedButton(
@@ -130,7 +175,7 @@ class SettingsFrame(ctk.CTkFrame):
     
     def _create_password_section(self):
         """Создание секции управления паролями."""
-        frame = self._create_section_frame("🔐 Управление паролем")
+        frame = self._create_section_frame(_L_SECTION_PASSWORD)
         
         # Контейнер для пароля
         password_container = ctk.CTkFrame(frame, fg_color="transparent")
@@ -142,8 +187,8 @@ class SettingsFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             password_input_frame,
-            text="Пароль для AD:",
-            font=ctk.CTkFont(size=14)
+            text=_L_PASSWORD,
+            font=_get_font(14)
         ).pack(anchor="w")
         
         self.password_entry = ctk.CTkEntry(
@@ -169,8 +214,8 @@ class SettingsFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             storage_frame,
-            text="Метод хранения:",
-            font=ctk.CTkFont(size=14)
+            text=_L_STORAGE,
+            font=_get_font(14)
         ).pack(anchor="w")
         
         self.storage_optionemenu = ctk.CTkOptionMenu(
@@ -203,7 +248,7 @@ class SettingsFrame(ctk.CTkFrame):
     
     def _create_user_management_section(self):
         """Создание секции управления пользователями."""
-        frame = self._create_section_frame("👥 Управление доступом")
+        frame = self._create_section_frame(_L_SECTION_USERS)
         
         container = ctk.CTkFrame(frame, fg_color="transparent")
         container.pack(fill="x", padx=20, pady=20)
@@ -211,8 +256,8 @@ class SettingsFrame(ctk.CTkFrame):
         # Список пользователей
         ctk.CTkLabel(
             container,
-            text="Пользователи с доступом:",
-            font=ctk.CTkFont(size=14)
+            text=_L_USERS,
+            font=_get_font(14)
         ).pack(anchor="w")
         
         # Фрейм для списка
@@ -222,8 +267,8 @@ class SettingsFrame(ctk.CTkFrame):
         self.users_textbox = ctk.CTkTextbox(list_frame, height=100)
         self.users_textbox.pack(fill="x", padx=10, pady=10)
         
-        # Загрузка списка пользователей
-        self._load_users_list()
+        # Загрузка списка пользователей (после первой отрисовки)
+        self.after_idle(self._load_users_list)
         
         # Управление пользователями
         user_control_frame = ctk.CTkFrame(container, fg_color="transparent")
@@ -253,7 +298,7 @@ class SettingsFrame(ctk.CTkFrame):
     
     def _create_advanced_section(self):
         """Создание секции расширенных настроек."""
-        frame = self._create_section_frame("⚙️ Расширенные настройки")
+        frame = self._create_section_frame(_L_SECTION_ADVANCED)
         
         container = ctk.CTkFrame(frame, fg_color="transparent")
         container.pack(fill="x", padx=20, pady=20)
@@ -280,8 +325,8 @@ class SettingsFrame(ctk.CTkFrame):
         
         ctk.CTkLabel(
             log_frame,
-            text="Уровень логирования:",
-            font=ctk.CTkFont(size=14)
+            text=_L_LOG_LEVEL,
+            font=_get_font(14)
         ).pack(side="left", padx=(0, 10))
         
         self.log_level_menu = ctk.CTkOptionMenu(
@@ -303,7 +348,7 @@ class SettingsFrame(ctk.CTkFrame):
             text="💾 Сохранить все настройки",
             command=self.save_all_settings,
             height=40,
-            font=ctk.CTkFont(size=14, weight="bold")
+            font=_get_font(14, "bold")
         ).pack(side="left", padx=(0, 10))
         
         # Кнопка сброса настроек
@@ -377,18 +422,22 @@ class SettingsFrame(ctk.CTkFrame):
             "Системная": "System"
         }
         mode = theme_map.get(value, "System")
+        if mode == self._current_appearance_mode:
+            return
         ctk.set_appearance_mode(mode)
         self._update_all_styles(mode)
+        self._current_appearance_mode = mode
     
     def _on_storage_method_change(self, method: str):
         """Обработка изменения метода хранения пароля."""
-        logger.debug(f"Выбран метод хранения: {method}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Выбран метод хранения: %s", method)
         self.load_password()
     
     def _on_log_level_change(self, level: str):
         """Обработка изменения уровня логирования."""
         logging.getLogger().setLevel(getattr(logging, level))
-        logger.info(f"Уровень логирования изменен на: {level}")
+        logger.info("Уровень логирования изменен на: %s", level)
     
     def _toggle_password_visibility(self):
         """Переключение видимости пароля."""
@@ -409,30 +458,15 @@ class SettingsFrame(ctk.CTkFrame):
         """Обновление темы контекстных меню."""
         appearance_mode = ctk.get_appearance_mode()
         
-        # Цвета для разных тем
-        if appearance_mode == "Dark":
-            bg = "#2e2e2e"
-            fg = "white"
-            active_bg = "#5f5f5f"
-        else:
-            bg = "white"
-            fg = "black"
-            active_bg = "#cfcfcf"
-        
-        # Обновление всех контекстных меню
+        # Обновление всех контекстных меню (меню новых вкладок оформляются при создании)
         tab_names = list(self.home_frame.tabview._tab_dict.keys())
         for tab_name in tab_names:
             try:
                 tab_frame = self.home_frame.tabview.tab(tab_name)
                 if tab_frame.winfo_children():
                     frame = tab_frame.winfo_children()[0]
-                    if hasattr(frame, 'context_menu'):
-                        frame.context_menu.configure(
-                            bg=bg,
-                            fg=fg,
-                            activebackground=active_bg,
-                            activeforeground=fg
-                        )
+                    if hasattr(frame, 'update_context_menu_style'):
+                        frame.update_context_menu_style(appearance_mode)
             except Exception as e:
                 logger.error(f"Ошибка обновления контекстного меню: {e}")
     
@@ -766,7 +800,7 @@ class SettingsFrame(ctk.CTkFrame):
         title_label = ctk.CTkLabel(
             help_window,
             text="Конвертация файла принтеров TXT → JSON",
-            font=ctk.CTkFont(size=16, weight="bold")
+            font=_get_font(16, "bold")
         )
         title_label.pack(pady=(10, 15))
         
@@ -774,7 +808,7 @@ class SettingsFrame(ctk.CTkFrame):
         format_label = ctk.CTkLabel(
             help_window,
             text="Формат входного TXT файла:\nназвание_принтера, IP_адрес / сервер1, сервер2, сервер3",
-            font=ctk.CTkFont(size=12)
+            font=_get_font(12)
         )
         format_label.pack(pady=(0, 10))
         
@@ -785,7 +819,7 @@ class SettingsFrame(ctk.CTkFrame):
         examples_label = ctk.CTkLabel(
             examples_frame,
             text="Примеры входного формата:",
-            font=ctk.CTkFont(size=14, weight="bold")
+            font=_get_font(14, "bold")
         )
         examples_label.pack(anchor="w", padx=10, pady=(10, 5))
         
@@ -806,7 +840,7 @@ acc_kyocera3040_k214, 10.1.7.164 / TS-ACC1, TS-ACC2, TS-ACC3, TS-ACC4"""
         process_label = ctk.CTkLabel(
             process_frame,
             text="Процесс обновления приложения:",
-            font=ctk.CTkFont(size=14, weight="bold")
+            font=_get_font(14, "bold")
         )
         process_label.pack(anchor="w", padx=10, pady=(10, 5))
         
@@ -834,7 +868,7 @@ acc_kyocera3040_k214, 10.1.7.164 / TS-ACC1, TS-ACC2, TS-ACC3, TS-ACC4"""
         notes_label = ctk.CTkLabel(
             notes_frame,
             text="Важные замечания:",
-            font=ctk.CTkFont(size=14, weight="bold")
+            font=_get_font(14, "bold")
         )
         notes_label.pack(anchor="w", padx=10, pady=(10, 5))
         
@@ -898,6 +932,25 @@ acc_kyocera3040_k214, 10.1.7.164 / TS-ACC1, TS-ACC2, TS-ACC3, TS-ACC4"""
     def save_all_settings(self):
         """Сохранение всех настроек."""
         try:
+            # Незавершенную загрузку вкладок доводим до конца, иначе сохранится их часть
+            self._finish_tab_loading()
+            
+            # Собираем данные вкладок
+            tabview = self.home_frame.tabview
+            tabs = [
+                self._collect_tab_config(tab_name, tabview.tab(tab_name).winfo_children()[0])
+                for tab_name in tabview._tab_dict
+            ]
+            
+            # Не созданные из конфигурации вкладки сохраняем в прежнем виде
+            if self._unrestored_tabs:
+                logger.warning("Вкладок не восстановлено: %d, их конфигурация сохраняется без изменений",
+                               len(self._unrestored_tabs))
+                tabs += [
+                    tab_data for tab_data in self._unrestored_tabs
+                    if tab_data["tab_name"] not in tabview._tab_dict
+                ]
+            
             # Собираем конфигурацию
             config = {
                 "ui_scaling": f"{int(self.scaling_slider.get() * 100)}%",
@@ -906,32 +959,9 @@ acc_kyocera3040_k214, 10.1.7.164 / TS-ACC1, TS-ACC2, TS-ACC3, TS-ACC4"""
                 "autoload": self.autoload_var.get(),
                 "autosave": self.autosave_var.get(),
                 "log_level": self.log_level_menu.get(),
-                "tabs": []
+                "tabs": tabs
             }
             
-            # Собираем данные вкладок
-            tab_names = list(self.home_frame.tabview._tab_dict.keys())
-            for tab_name in tab_names:
-                tab_frame = self.home_frame.tabview.tab(tab_name).winfo_children()[0]
-                
-                # Собираем только группы (не сессии и не принтеры)
-                groups = []
-                for item in tab_frame.group_tree.get_children():
-                    groups.append(tab_frame.group_tree.item(item, "values"))
-                
-                tab_data = {
-                    "tab_name": tab_name,
-                    "server": tab_frame.server_entry.get(),
-                    "domain": tab_frame.combobox_domain.get(),
-                    "password_status": tab_frame.password_status_entry.get(),
-                    "group_search": tab_frame.group_search_entry.get(),
-                    "groups": groups,  # Только группы, без сессий и принтеров
-                    "session_tree_columns": tab_frame.get_treeview_column_widths(tab_frame.tree),
-                    "group_tree_columns": tab_frame.get_treeview_column_widths(tab_frame.group_tree),
-                    "printer_tree_columns": tab_frame.get_treeview_column_widths(tab_frame.printer_manager.tree)
-                }
-                config["tabs"].append(tab_data)
-            
             # Сохраняем конфигурацию
             success = self.config_manager.save_config(config)
             
@@ -945,82 +975,173 @@ acc_kyocera3040_k214, 10.1.7.164 / TS-ACC1, TS-ACC2, TS-ACC3, TS-ACC4"""
             logger.error(f"Ошибка сохранения настроек: {e}", exc_info=True)
             self.parent.show_error("Ошибка", f"Не удалось сохранить настройки: {e}")
     
+    def _collect_tab_config(self, tab_name: str, tab_frame: TabHomeFrame) -> Dict[str, Any]:
+        """Сбор конфигурации одной вкладки."""
+        group_tree = tab_frame.group_tree
+        return {
+            "tab_name": tab_name,
+            "server": tab_frame.server_entry.get(),
+            "domain": tab_frame.combobox_domain.get(),
+            "password_status": tab_frame.password_status_entry.get(),
+            "group_search": tab_frame.group_search_entry.get(),
+            # Только группы, без сессий и принтеров
+            "groups": [group_tree.item(item, "values") for item in group_tree.get_children()],
+            "session_tree_columns": tab_frame.get_treeview_column_widths(tab_frame.tree),
+            "group_tree_columns": tab_frame.get_treeview_column_widths(group_tree),
+            "printer_tree_columns": tab_frame.get_treeview_column_widths(tab_frame.printer_manager.tree)
+        }
+    
     def load_all_settings(self):
         """Загрузка всех настроек."""
         try:
             # Загружаем пароль
             self.load_password()
             
-            # Загружаем конфигурацию
-            config = self.config_manager.load_config()
+            # Загружаем конфигурацию поверх значений по умолчанию
+            config = {**_LOAD_DEFAULTS, **self.config_manager.load_config()}
+            self._unrestored_tabs = list(config["tabs"])
             
             # Применяем настройки UI
-            scaling = config.get("ui_scaling", "100%")
+            scaling = config["ui_scaling"]
             scale_value = int(scaling.strip('%')) / 100
             self.scaling_slider.set(scale_value)
             self._on_scaling_change(scale_value)
             
             # Применяем тему
-            theme = config.get("appearance_mode", "System")
+            theme = config["appearance_mode"]
             theme_russian = self._get_theme_russian_name(theme)
             self.appearance_mode_menu.set(theme_russian)
             self._on_theme_change(theme_russian)
             
             # Метод хранения пароля
-            storage = config.get("storage_method", "Credential Manager")
+            storage = config["storage_method"]
             self.storage_optionemenu.set(storage)
             
             # Дополнительные настройки
-            self.autoload_var.set(config.get("autoload", True))
-            self.autosave_var.set(config.get("autosave", True))
-            self.log_level_menu.set(config.get("log_level", "INFO"))
-            self._on_log_level_change(config.get("log_level", "INFO"))
+            self.autoload_var.set(config["autoload"])
+            self.autosave_var.set(config["autosave"])
+            self.log_level_menu.set(config["log_level"])
+            self._on_log_level_change(config["log_level"])
             
             # Удаляем существующие вкладки
             for tab_name in list(self.home_frame.tabview._tab_dict.keys()):
                 self.home_frame.tabview.delete(tab_name)
             
             # Создаем вкладки из конфигурации
-            tabs = config.get("tabs", [])
+            tabs = config["tabs"]
             if not tabs:
                 # Если вкладок нет, создаем дефолтные
                 logger.debug("В конфигурации нет вкладок, создаём дефолтные")
-                for i in range(1, 4):
-                    tab_name = f"Сервер {i}"
-                    tab = self.home_frame.tabview.add(tab_name)
-                    TabHomeFrame(tab, tab_name, self.parent, load_from_config=False).pack(fill="both", expand=True)
+                self._tab_loader = None
+                self._create_default_tabs()
             else:
-                # Создаем вкладки из конфигурации
-                for tab_data in tabs:
-                    tab = self.home_frame.tabview.add(tab_data["tab_name"])
-                    tab_frame = TabHomeFrame(
-                        tab,
-                        tab_data["tab_name"],
-                        self.parent,
-                        load_from_config=True,
-                        config_data=tab_data
-                    )
-                    tab_frame.pack(fill="both", expand=True)
-                    
-                    # Восстанавливаем данные таблиц
-                    for session in tab_data.get("sessions", []):
-                        tab_frame.tree.insert("", "end", values=session)
-                    
-                    for group in tab_data.get("groups", []):
-                        tab_frame.group_tree.insert("", "end", values=group)
-                    
-                    for printer in tab_data.get("printers", []):
-                        tab_frame.printer_manager.tree.insert("", "end", values=printer)
+                # Вкладки создаются по одной, чтобы интерфейс перерисовывался между ними
+                self._tab_loader = self._iter_tabs_creation(tabs)
+                self.after(0, self._load_tabs_step, self._tab_loader)
             
             logger.info("Настройки успешно загружены")
             
         except Exception as e:
             logger.error(f"Ошибка загрузки настроек: {e}", exc_info=True)
-            # При ошибке создаем дефолтные вкладки
-            for i in range(1, 4):
-                tab_name = f"Сервер {i}"
-                tab = self.home_frame.tabview.add(tab_name)
-                TabHomeFrame(tab, tab_name, self.parent, load_from_config=False).pack(fill="both", expand=True)
+            # При ошибке создаем дефолтные вкладки (сохраненные остаются в _unrestored_tabs)
+            self._tab_loader = None
+            self._create_default_tabs()
+    
+    def _create_default_tabs(self):
+        """Создание дефолтных вкладок."""
+        for i in range(1, 4):
+            tab_name = f"Сервер {i}"
+            tab = self.home_frame.tabview.add(tab_name)
+            TabHomeFrame(tab, tab_name, self.parent, load_from_config=False).pack(fill="both", expand=True)
+    
+    def _iter_tabs_creation(self, tabs: List[Dict[str, Any]]) -> Iterator[None]:
+        """Создание вкладок из конфигурации, по одной вкладке за шаг.
+        
+        Вкладка, которую не удалось создать, пропускается и остается
+        в _unrestored_tabs, чтобы сохранение не потеряло ее конфигурацию.
+        """
+        for tab_data in tabs:
+            try:
+                self._create_config_tab(tab_data)
+            except Exception as e:
+                logger.error("Ошибка создания вкладки '%s': %s", tab_data.get("tab_name"), e, exc_info=True)
+            else:
+                self._unrestored_tabs.remove(tab_data)
+            yield
+        
+        if not self.home_frame.tabview._tab_dict:
+            self._create_default_tabs()
+    
+    def _create_config_tab(self, tab_data: Dict[str, Any]):
+        """Создание одной вкладки из конфигурации."""
+        tabview = self.home_frame.tabview
+        tab_name = tab_data["tab_name"]
+        tab = tabview.add(tab_name)
+        try:
+            tab_frame = TabHomeFrame(
+                tab,
+                tab_name,
+                self.parent,
+                load_from_config=True,
+                config_data=tab_data
+            )
+            tab_frame.pack(fill="both", expand=True)
+            
+            # Восстанавливаем данные таблиц
+            for session in tab_data.get("sessions", []):
+                tab_frame.tree.insert("", "end", values=session)
+            
+            for group in tab_data.get("groups", []):
+                tab_frame.group_tree.insert("", "end", values=group)
+            
+            for printer in tab_data.get("printers", []):
+                tab_frame.printer_manager.tree.insert("", "end", values=printer)
+        except Exception:
+            # Пустая вкладка без фрейма сломала бы сбор конфигурации
+            tabview.delete(tab_name)
+            raise
+    
+    def _load_tabs_step(self, loader: Iterator[None]):
+        """Выполнение одного шага загрузки вкладок."""
+        # Загрузка была перезапущена или завершена синхронно
+        if loader is not self._tab_loader:
+            return
+        
+        if self._advance_tab_loader(loader):
+            self.after(1, self._load_tabs_step, loader)
+    
+    def _advance_tab_loader(self, loader: Iterator[None]) -> bool:
+        """Создание очередной вкладки. Возвращает True, если остались еще вкладки."""
+        try:
+            next(loader)
+        except StopIteration:
+            self._tab_loader = None
+            logger.debug("Вкладки из конфигурации загружены")
+            return False
+        except Exception as e:
+            self._tab_loader = None
+            logger.error(f"Ошибка загрузки вкладок: {e}", exc_info=True)
+            if not self.home_frame.tabview._tab_dict:
+                self._create_default_tabs()
+            return False
+        return True
+    
+    def _finish_tab_loading(self):
+        """Синхронное создание вкладок, оставшихся от поэтапной загрузки."""
+        while self._tab_loader is not None:
+            self._advance_tab_loader(self._tab_loader)
+    
+    def prepare_tabs_change(self):
+        """Подготовка к изменению набора вкладок пользователем.
+        
+        Загрузка вкладок завершается до изменения (иначе возможны конфликты
+        имен), после чего сохраняются уже вкладки, видимые пользователю.
+        """
+        self._finish_tab_loading()
+        if self._unrestored_tabs:
+            logger.warning("Вкладки изменены пользователем, невосстановленные вкладки не сохраняются: %s",
+                           ", ".join(tab_data["tab_name"] for tab_data in self._unrestored_tabs))
+            self._unrestored_tabs = []
     
     def _get_theme_english_name(self) -> str:
         """Получение английского названия темы."""
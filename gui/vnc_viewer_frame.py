@@ -2,22 +2,49 @@
 import customtkinter as ctk
 from tkinter import Canvas, messagebox
 import socket
+import selectors
 import threading
 import struct
 import logging
 from typing import Optional, Tuple, Dict, Any
-from PIL import Image, ImageTk
-import queue
+from PIL import Image, ImageChops, ImageTk, features
+import io
+import math
+from collections import OrderedDict, deque
 import time
 import random
 try:
     from Crypto.Cipher import DES
 except ImportError:
     DES = None
+# inflate с SIMD-ускорением (isal / zlib-ng), если установлено
+try:
+    from isal import isal_zlib as zlib_impl
+except ImportError:
+    try:
+        from zlib_ng import zlib_ng as zlib_impl
+    except ImportError:
+        import zlib as zlib_impl
 import hashlib
 
 logger = logging.getLogger(__name__)
 
+# Tight JPEG декодируется Pillow; libjpeg-turbo дает SIMD IDCT и конвертацию цвета
+if not features.check_feature('libjpeg_turbo'):
+    logger.info("Pillow собран без libjpeg-turbo, декодирование Tight JPEG будет медленнее")
+
+# Соответствие Tk keysym -> X11 keysym для специальных клавиш
+_KEYSYM_MAP: Dict[str, int] = {
+    'Return': 0xff0d, 'Escape': 0xff1b, 'BackSpace': 0xff08, 'Tab': 0xff09,
+    'space': 0x0020, 'Delete': 0xffff, 'Home': 0xff50, 'End': 0xff57,
+    'Prior': 0xff55, 'Next': 0xff56, 'Left': 0xff51, 'Up': 0xff52,
+    'Right': 0xff53, 'Down': 0xff54, 'F1': 0xffbe, 'F2': 0xffbf,
+    'F3': 0xffc0, 'F4': 0xffc1, 'F5': 0xffc2, 'F6': 0xffc3,
+    'F7': 0xffc4, 'F8': 0xffc5, 'F9': 0xffc6, 'F10': 0xffc7,
+    'F11': 0xffc8, 'F12': 0xffc9, 'Shift_L': 0xffe1, 'Shift_R': 0xffe2,
+    'Control_L': 0xffe3, 'Control_R': 0xffe4, 'Alt_L': 0xffe9, 'Alt_R': 0xffea,
+}
+
 class VNCViewerFrame(ctk.CTkFrame):
     """Высокопроизводительный VNC клиент с плавным отображением."""
     
@@ -30,6 +57,7 @@ class VNCViewerFrame(ctk.CTkFrame):
     SECURITY_ULTRA_MS_LOGON_II = 117
     
     # Client message types
+    SET_PIXEL_FORMAT = 0
     SET_ENCODINGS = 2
     FRAMEBUFFER_UPDATE_REQUEST = 3
     KEY_EVENT = 4
@@ -45,6 +73,90 @@ class VNCViewerFrame(ctk.CTkFrame):
     ENCODING_RAW = 0
     ENCODING_COPYRECT = 1
     ENCODING_RRE = 2
+    ENCODING_HEXTILE = 5
+    ENCODING_ZLIB = 6
+    ENCODING_TIGHT = 7
+    ENCODING_ZRLE = 16
+    
+    # Pseudo-encodings
+    ENCODING_DESKTOP_SIZE = -223
+    ENCODING_LAST_RECT = -224
+    ENCODING_JPEG_QUALITY_LEVEL_0 = -32
+    
+    # Уровень качества JPEG для Tight (0-9)
+    JPEG_QUALITY_LEVEL = 6
+    
+    # Hextile subencoding flags
+    HEXTILE_RAW = 1
+    HEXTILE_BACKGROUND = 2
+    HEXTILE_FOREGROUND = 4
+    HEXTILE_ANY_SUBRECTS = 8
+    HEXTILE_SUBRECTS_COLOURED = 16
+    
+    # Tight compression control
+    TIGHT_FILL = 0x08
+    TIGHT_JPEG = 0x09
+    TIGHT_EXPLICIT_FILTER = 0x04
+    TIGHT_FILTER_COPY = 0
+    TIGHT_FILTER_PALETTE = 1
+    TIGHT_FILTER_GRADIENT = 2
+    TIGHT_MIN_TO_COMPRESS = 12
+    
+    # Gradient фильтр Tight: блок строк после строки с ограничением прогноза
+    # и максимум строк, декодируемых побайтно подряд (для данных с шумом)
+    GRADIENT_MIN_BLOCK = 8
+    GRADIENT_MAX_EXACT_RUN = 64
+    
+    # LRU кэш декодированных JPEG прямоугольников Tight
+    JPEG_CACHE_SIZE = 64
+    JPEG_CACHE_MAX_PIXELS = 65536
+    
+    # Измененные области: близкие объединяются, при переполнении списка - в одну
+    MAX_DIRTY_RECTS = 8
+    DIRTY_MERGE_SLACK = 64 * 64     # Допустимая лишняя площадь при объединении
+    SCALE_TILE_SIZE = 64            # Тайл масштабированного вывода (в пикселях вывода)
+    PATCH_PHOTO_CACHE_SIZE = 16     # Промежуточные PhotoImage областей (по одному на размер)
+    
+    # Параметры приёма данных
+    RECV_CHUNK_SIZE = 1 << 16       # Минимальное свободное место для recv_into
+    RX_BUFFER_SIZE = 1 << 18        # Емкость приёмного буфера
+    SOCKET_RCVBUF_SIZE = 1 << 21    # 2 MiB буфер приёма ядра
+    SOCKET_SNDBUF_SIZE = 1 << 14    # 16 KiB: клиент шлет только мелкие события ввода
+    RECEIVE_POLL_INTERVAL = 0.033   # Ожидание данных в selector между проверками остановки
+    POINTER_FLUSH_INTERVAL = 16     # мс между отправками движения мыши (~60 Гц)
+    
+    # Режимы производительности: интервал запросов, интервал непрерывных
+    # обновлений (секунды), максимум ожидающих запросов
+    _QUALITY_PROFILES = {
+        "Производительность": (0.025, 0.033, 2),  # 40 FPS, 30 FPS continuous
+        "Сбалансированный": (0.033, 0.05, 2),     # 30 FPS, 20 FPS continuous
+        "Качество": (0.05, 0.1, 1),               # 20 FPS, 10 FPS continuous
+    }
+    
+    # Предкомпилированные форматы разбора протокола
+    _U8 = struct.Struct("!B")
+    _U16 = struct.Struct("!H")
+    _U32 = struct.Struct("!I")
+    _S32 = struct.Struct("!i")
+    _U16_PAIR = struct.Struct("!HH")
+    _RECT_HEADER = struct.Struct("!HHHHi")  # x, y, w, h, encoding
+    _KEY_EVENT = struct.Struct("!BBxxI")
+    _POINTER_EVENT = struct.Struct("!BBHH")  # type, button-mask, x, y
+    _UPDATE_REQUEST = struct.Struct("!BBHHHH")  # type, incremental, x, y, w, h
+    # Подпрямоугольник RRE (pixel, x, y, w, h) по числу байт на пиксель (8/16/32 bpp)
+    _RRE_SUBRECT = {size: struct.Struct(f"!{size}sHHHH") for size in (1, 2, 4)}
+    
+    _PIXEL_FORMAT = struct.Struct("!BBBBHHHBBBxxx")  # PIXEL_FORMAT из RFC 6143 (16 байт)
+    
+    # Формат пикселей клиента: 32 bpp little-endian BGRX (depth 24).
+    # Совпадает с raw-режимом PIL 'BGRX', данные не требуют перепаковки.
+    CLIENT_PIXEL_FORMAT = _PIXEL_FORMAT.pack(32, 24, 0, 1, 255, 255, 255, 16, 8, 0)
+    
+    # Raw-декодеры PIL для пикселей клиента по числу байт на пиксель
+    _RAW_MODES = {4: 'BGRX', 3: 'BGR'}
+    
+    # Таблица реверса битов в байте (ключ VNC DES использует зеркальный порядок бит)
+    _BITREV_LUT: bytes = bytes(int(f'{i:08b}'[::-1], 2) for i in range(256))
     
     def __init__(self, parent, app):
         super().__init__(parent, corner_radius=0, fg_color="transparent")
@@ -56,9 +168,18 @@ class VNCViewerFrame(ctk.CTkFrame):
         self.screen_height = 0
         self.pixel_format = None
         self.framebuffer = None
+        self._rebuild_update_requests()
+        
+        # Приёмный буфер: данные читаются из сокета крупными блоками
+        self._reset_rx_buffer()
+        self._quickack = False  # TCP_QUICKACK включен и восстанавливается после крупных чтений
         
         # ОПТИМИЗАЦИЯ: Минимальные очереди для максимальной скорости
-        self.update_queue = queue.Queue(maxsize=3)  # Уменьшили размер очереди
+        # deque: append/popleft атомарны под GIL, при переполнении
+        # самое старое событие вытесняется без блокировок
+        self.update_queue = deque(maxlen=3)
+        self._events_signaled = False  # <<VNCEvents>> уже поставлено в очередь Tk
+        self._display_pending = False  # Framebuffer изменен и еще не отрисован
         
         # Флаги состояния
         self.receiving_thread = None
@@ -66,39 +187,77 @@ class VNCViewerFrame(ctk.CTkFrame):
         
         # СТАБИЛЬНОСТЬ: Сбалансированные настройки для надежности
         self.update_request_interval = 0.033        # 30 FPS (стабильно)
-        self.canvas_update_interval = 0.033         # 30 FPS для UI
         self.continuous_update_interval = 0.05      # 20 FPS continuous
-        self.force_update_interval = 0.2            # 5 FPS принудительно
+        self.force_update_interval = 0.2            # 5 FPS без непрерывного режима
+        self.server_response_timeout = 2.0          # Полное обновление после молчания сервера
         
         # УПРОЩЕНИЕ: Консервативный контроль pending requests
         self.pending_update_requests = 0
         self.max_pending_requests = 2  # Уменьшили для стабильности
+        self._update_request_deferred = False  # Ввод ждет завершения текущего запроса
         self.last_update_request_time = 0
-        self.last_server_response_time = time.time()
+        self.last_server_response_time = time.monotonic()
+        self.last_framebuffer_time = self.last_server_response_time
         
-        # ПРОИЗВОДИТЕЛЬНОСТЬ: Быстрые таймеры
-        self.force_update_timer = None
-        self.continuous_update_timer = None
-        self.last_force_update = 0
+        # ПРОИЗВОДИТЕЛЬНОСТЬ: Единый таймер запросов обновления
+        self.update_timer = None
         
         # ОПТИМИЗАЦИЯ: Быстрое обновление canvas
         self.pending_canvas_update = False
-        self.last_canvas_update = 0
         
         # СТАБИЛЬНОСТЬ: Упрощенная стратегия обновлений
         self.continuous_updates = False  # По умолчанию выключены для стабильности
         
-        # Статистика (упрощенная)
+        # Статистика (упрощенная). frame_count - перерисовки canvas, меняется
+        # только в UI потоке. update_count - обновления от сервера, только
+        # растет в потоке приёма; UI считает разницу со снимком и не сбрасывает
+        # счетчик, поэтому инкременты не теряются без блокировок
         self.frame_count = 0
-        self.last_fps_time = time.time()
+        self.last_fps_time = time.monotonic()
         self.updates_per_second = 0
-        self.last_update_count_time = time.time()
+        self.last_update_count_time = time.monotonic()
         self.update_count = 0
+        self._stats_update_count = 0
         
-        # ОПТИМИЗАЦИЯ: Прямое кэширование изображений
+        # ОПТИМИЗАЦИЯ: LRU кэш декодированных изображений (ключ - размер и хэш данных)
         self.image_cache_enabled = True
-        self.last_image_hash = None
-        self.cached_photo = None
+        self.image_cache = OrderedDict()
+        
+        # Объединение PointerEvent движения мыши до idle-итерации Tk
+        self._pending_pointer = None
+        self._pointer_flush_scheduled = False
+        
+        # Постоянное PhotoImage и элемент canvas для отображения экрана
+        self._tk_image = None
+        self._canvas_image_id = None
+        
+        # LRU промежуточных PhotoImage для вывода областей: {(w, h): PhotoImage}
+        self._patch_photos = OrderedDict()
+        
+        # Измененные области [(x1, y1, x2, y2), ...] с последней перерисовки
+        self._dirty_rects = []
+        self._dirty_lock = threading.Lock()
+        
+        # Размер выводимого изображения (задает UI поток) и подготовленные
+        # потоком приёма области (dirty_rects, [(size, patch, x, y), ...]) для него
+        self._display_size = None
+        self._prepared_region = None
+        
+        # Обработчики прямоугольников по кодировке (одна dict-операция на прямоугольник)
+        self._rect_handlers = {
+            self.ENCODING_RAW: self._handle_raw_rectangle_stable,
+            self.ENCODING_COPYRECT: self._handle_copyrect_fast,
+            self.ENCODING_TIGHT: self._handle_tight_rectangle,
+            self.ENCODING_ZRLE: self._handle_zrle_rectangle,
+            self.ENCODING_HEXTILE: self._handle_hextile_rectangle,
+            self.ENCODING_ZLIB: self._handle_zlib_rectangle,
+            self.ENCODING_RRE: self._handle_rre_rectangle,
+        }
+        
+        # Масштаб вывода: пересчитывается при смене режима, размера canvas
+        # или разрешения сервера, а не на каждом событии мыши
+        self._scale_factor = 1.0
+        self._inv_scale_factor = 1.0
         
         # Счетчики ошибок (упрощенные)
         self.protocol_errors = 0
@@ -110,8 +269,11 @@ class VNCViewerFrame(ctk.CTkFrame):
         # Запуск обработчика событий (оптимизированный)
         self._start_event_processor()
         
-        # Запуск обновления статистики
-        self._update_stats()
+        # Статистика обновляется раз в секунду, пока есть подключение
+        self._stats_timer = None
+        self._stats_next_deadline = 0.0
+        self._label_texts = {}  # Последний выведенный текст меток статистики
+        self._activity_timer = None  # Таймер гашения индикатора активности
     
     def _setup_ui(self):
         """Настройка пользовательского интерфейса."""
@@ -208,6 +370,7 @@ class VNCViewerFrame(ctk.CTkFrame):
         )
         scale_menu.pack(side="left", padx=5)
         scale_menu.set("100%")
+        self.scale_var.trace_add("write", lambda *_: self._update_scale_factor())
     
     def _create_viewer_area(self):
         """Создание области просмотра."""
@@ -251,6 +414,7 @@ class VNCViewerFrame(ctk.CTkFrame):
         self.canvas.bind("<ButtonRelease-3>", self._on_right_release)
         self.canvas.bind("<Motion>", self._on_mouse_move)
         self.canvas.bind("<MouseWheel>", self._on_mouse_wheel)
+        self.canvas.bind("<Configure>", lambda e: self._update_scale_factor())
         
         # Клавиатура
         self.canvas.bind("<Enter>", lambda e: self.canvas.focus_set())
@@ -314,35 +478,71 @@ class VNCViewerFrame(ctk.CTkFrame):
             messagebox.showerror("Ошибка", "Введите адрес VNC сервера")
             return
         
-        # Парсинг адреса
-        if ':' in server_address:
-            host, port = server_address.split(':')
-            port = int(port)
-        else:
-            host = server_address
-            port = 5900
+        try:
+            family, address = self._parse_server_address(server_address)
+        except ValueError as e:
+            messagebox.showerror("Ошибка", str(e))
+            return
         
         password = self.password_entry.get()
         
         # Запуск подключения в отдельном потоке
         threading.Thread(
             target=self._connect_thread,
-            args=(host, port, password),
+            args=(family, address, password, server_address),
             daemon=True
         ).start()
     
-    def _connect_thread(self, host: str, port: int, password: str):
+    def _parse_server_address(self, server_address: str) -> Tuple[int, Any]:
+        """Разбор адреса сервера в семейство сокета и адрес для connect.
+        
+        Поддерживаются host[:port] (TCP), unix:///путь/к/сокету для
+        локального сервера и vsock://CID:PORT для сервера в виртуальной
+        машине. RFB поверх них не отличается от TCP.
+        
+        Raises:
+            ValueError: если адрес некорректен или транспорт недоступен
+        """
+        if server_address.startswith("unix://"):
+            if not hasattr(socket, 'AF_UNIX'):
+                raise ValueError("Unix-сокеты не поддерживаются в этой системе")
+            return socket.AF_UNIX, server_address[len("unix://"):]
+        
+        if server_address.startswith("vsock://"):
+            if not hasattr(socket, 'AF_VSOCK'):
+                raise ValueError("VSOCK не поддерживается в этой системе")
+            cid, _, port = server_address[len("vsock://"):].partition(':')
+            try:
+                return socket.AF_VSOCK, (int(cid), int(port or 5900))
+            except ValueError:
+                raise ValueError(f"Некорректный адрес VSOCK: {server_address}")
+        
+        if ':' in server_address:
+            host, port = server_address.split(':')
+            port = int(port)
+        else:
+            host = server_address
+            port = 5900
+        return socket.AF_INET, (host, port)
+    
+    def _connect_thread(self, family: int, address: Any, password: str, server_address: str):
         """Поток подключения к VNC серверу."""
         try:
             self._update_status("Подключение...")
             
             # Создание сокета
-            self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.socket = socket.socket(family, socket.SOCK_STREAM)
+            self._reset_rx_buffer()
+            self._quickack = False
+            # Увеличенные буферы задаются до connect, чтобы учесться в TCP окне
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.SOCKET_RCVBUF_SIZE)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.SOCKET_SNDBUF_SIZE)
             self.socket.settimeout(10)
-            self.socket.connect((host, port))
+            self.socket.connect(address)
             
-            # ПРОИЗВОДИТЕЛЬНОСТЬ: Оптимизация сокета для низкой задержки
-            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Параметры TCP не применимы к локальным транспортам
+            if family == socket.AF_INET:
+                self._tune_socket()
             self.socket.settimeout(2)  # Быстрый таймаут для производительности
             
             # Handshake и аутентификация
@@ -356,15 +556,16 @@ class VNCViewerFrame(ctk.CTkFrame):
                 raise Exception("Ошибка инициализации")
             
             self.connected = True
-            self._update_status(f"Подключено к {host}:{port}")
+            self._update_status(f"Подключено к {server_address}")
             
-            # Сброс счетчиков
-            self.pending_update_requests = 0
-            self.last_server_response_time = time.time()
+            # Сброс счетчиков (первый полный запрос отправлен в _initialize)
+            self.pending_update_requests = 1
+            self.last_update_request_time = time.monotonic()
+            self.last_server_response_time = time.monotonic()
             self.protocol_errors = 0
             
             # НОВОЕ: Инициализация времени последнего framebuffer
-            self.last_framebuffer_time = time.time()
+            self.last_framebuffer_time = time.monotonic()
             
             # Обновление UI
             self.after(0, self._on_connected)
@@ -373,39 +574,56 @@ class VNCViewerFrame(ctk.CTkFrame):
             self._start_receiver_thread()
             
             # СТАБИЛЬНОСТЬ: Осторожный старт обновлений
-            self.after(0, self._start_high_performance_timers)
-            self.after(100, lambda: self._request_framebuffer_update_stable(incremental=False))
+            self.after(0, self._start_update_timer)
             self.after(300, lambda: self._request_framebuffer_update_stable(incremental=True))
             
         except Exception as e:
-            logger.error(f"Ошибка подключения: {e}")
+            logger.error("Ошибка подключения: %s", e)
             self._update_status(f"Ошибка: {str(e)}")
             self.after(0, self._on_connection_failed, str(e))
     
+    def _tune_socket(self):
+        """Настройка подключенного сокета на минимальную задержку событий ввода."""
+        try:
+            # ПРОИЗВОДИТЕЛЬНОСТЬ: Без алгоритма Нейгла мелкие события не ждут ACK
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            # Linux: немедленные ACK вместо отложенных (до 200 мс на мелких ответах)
+            if hasattr(socket, 'TCP_QUICKACK'):
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+                self._quickack = True
+        except OSError as e:
+            logger.debug("Socket tuning not supported: %s", e)
+        
+        logger.debug(
+            "Socket buffers: SO_RCVBUF=%s, SO_SNDBUF=%s",
+            self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF),
+            self.socket.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF)
+        )
+    
     def _handshake(self) -> bool:
         """VNC handshake."""
         try:
             server_version = self._recv_exact(12)
-            logger.debug(f"Server version: {server_version}")
-            self.socket.send(self.RFB_VERSION_3_8)
+            logger.debug("Server version: %s", server_version)
+            self.socket.sendall(self.RFB_VERSION_3_8)
             return True
         except Exception as e:
-            logger.error(f"Handshake error: {e}")
+            logger.error("Handshake error: %s", e)
             return False
     
     def _authenticate(self, password: str) -> bool:
         """Аутентификация."""
         try:
-            num_security_types = struct.unpack("!B", self._recv_exact(1))[0]
+            num_security_types = self._recv_struct(self._U8)[0]
             
             if num_security_types == 0:
-                reason_length = struct.unpack("!I", self._recv_exact(4))[0]
+                reason_length = self._recv_struct(self._U32)[0]
                 reason = self._recv_exact(reason_length).decode()
-                logger.error(f"Server error: {reason}")
+                logger.error("Server error: %s", reason)
                 return False
             
-            security_types = struct.unpack(f"!{num_security_types}B", self._recv_exact(num_security_types))
-            logger.debug(f"Security types: {security_types}")
+            security_types = tuple(self._recv_exact(num_security_types))
+            logger.debug("Security types: %s", security_types)
             
             # Выбираем подходящий тип безопасности
             if self.SECURITY_VNC in security_types:
@@ -413,10 +631,10 @@ class VNCViewerFrame(ctk.CTkFrame):
             elif self.SECURITY_NONE in security_types:
                 selected_type = self.SECURITY_NONE
             else:
-                logger.error(f"No supported security types in {security_types}")
+                logger.error("No supported security types in %s", security_types)
                 return False
             
-            self.socket.send(struct.pack("!B", selected_type))
+            self.socket.sendall(self._U8.pack(selected_type))
             
             if selected_type == self.SECURITY_NONE:
                 return self._auth_none()
@@ -426,23 +644,23 @@ class VNCViewerFrame(ctk.CTkFrame):
             return False
             
         except Exception as e:
-            logger.error(f"Authentication error: {e}")
+            logger.error("Authentication error: %s", e)
             return False
     
     def _auth_none(self) -> bool:
         """Аутентификация без пароля."""
         try:
             result_data = self._recv_exact(4)
-            result = struct.unpack("!I", result_data)[0]
+            result = self._U32.unpack(result_data)[0]
             
             if result == 0:
                 logger.info("No authentication successful")
                 return True
             else:
-                logger.error(f"No authentication failed: {result}")
+                logger.error("No authentication failed: %s", result)
                 return False
         except Exception as e:
-            logger.error(f"No auth error: {e}")
+            logger.error("No auth error: %s", e)
             return False
     
     def _auth_vnc(self, password: str) -> bool:
@@ -450,20 +668,20 @@ class VNCViewerFrame(ctk.CTkFrame):
         try:
             challenge = self._recv_exact(16)
             response = self._encrypt_password(password or "", challenge)
-            self.socket.send(response)
+            self.socket.sendall(response)
             
             result_data = self._recv_exact(4)
-            result = struct.unpack("!I", result_data)[0]
+            result = self._U32.unpack(result_data)[0]
             
             if result == 0:
                 logger.info("VNC authentication successful")
                 return True
             else:
-                logger.error(f"VNC authentication failed: {result}")
+                logger.error("VNC authentication failed: %s", result)
                 return False
                 
         except Exception as e:
-            logger.error(f"VNC auth error: {e}")
+            logger.error("VNC auth error: %s", e)
             return False
     
     def _encrypt_password(self, password: str, challenge: bytes) -> bytes:
@@ -471,7 +689,7 @@ class VNCViewerFrame(ctk.CTkFrame):
         if DES:
             password_bytes = password[:8].ljust(8, '\0').encode('utf-8')[:8]
             password_bytes = password_bytes.ljust(8, b'\0')[:8]
-            password_bytes = bytes(self._reverse_bits(b) for b in password_bytes)
+            password_bytes = password_bytes.translate(self._BITREV_LUT)
             
             cipher = DES.new(password_bytes, DES.MODE_ECB)
             return cipher.encrypt(challenge)
@@ -482,158 +700,213 @@ class VNCViewerFrame(ctk.CTkFrame):
             
             key_bytes = password[:8].ljust(8, '\0').encode('utf-8')[:8]
             key_bytes = key_bytes.ljust(8, b'\0')[:8]
-            key_bytes = bytes(self._reverse_bits(b) for b in key_bytes)
-            
-            result = bytearray(16)
-            for i in range(16):
-                result[i] = challenge[i] ^ key_bytes[i % 8]
+            key_bytes = key_bytes.translate(self._BITREV_LUT)
             
-            return bytes(result)
-    
-    def _reverse_bits(self, byte: int) -> int:
-        """Реверс битов в байте."""
-        return int('{:08b}'.format(byte)[::-1], 2)
+            # XOR всех 16 байт одной операцией над целыми числами
+            key = int.from_bytes(key_bytes * 2, 'big')
+            return (int.from_bytes(challenge[:16], 'big') ^ key).to_bytes(16, 'big')
     
     def _initialize(self) -> bool:
         """Инициализация VNC соединения."""
         try:
             # ClientInit
-            self.socket.send(struct.pack("!B", 1))  # shared
+            self.socket.sendall(self._U8.pack(1))  # shared
             
             # ServerInit
             size_data = self._recv_exact(4)
-            self.screen_width, self.screen_height = struct.unpack("!HH", size_data)
-            logger.info(f"Screen size: {self.screen_width}x{self.screen_height}")
+            self.screen_width, self.screen_height = self._U16_PAIR.unpack(size_data)
+            logger.info("Screen size: %sx%s", self.screen_width, self.screen_height)
+            self._rebuild_update_requests()
+            self.after(0, self._update_scale_factor)
             
             # Pixel format
             pixel_format_data = self._recv_exact(16)
-            self.pixel_format = self._parse_pixel_format(pixel_format_data)
+            server_pixel_format = self._parse_pixel_format(pixel_format_data)
+            logger.debug("Server pixel format: %s", server_pixel_format)
             
             # Desktop name
-            name_length = struct.unpack("!I", self._recv_exact(4))[0]
+            name_length = self._recv_struct(self._U32)[0]
             desktop_name = self._recv_exact(name_length).decode()
-            logger.info(f"Desktop name: {desktop_name}")
+            logger.info("Desktop name: %s", desktop_name)
             
             # Инициализация framebuffer
             self.framebuffer = Image.new('RGB', (self.screen_width, self.screen_height))
             
-            # ПРОИЗВОДИТЕЛЬНОСТЬ: Минимальный набор кодировок для скорости
-            self._set_encodings_optimized()
+            # zlib потоки сжатых кодировок живут всё соединение
+            self._zlib_stream = zlib_impl.decompressobj()
+            self._zrle_stream = zlib_impl.decompressobj()
+            self._tight_streams = [zlib_impl.decompressobj() for _ in range(4)]
+            self.image_cache.clear()
+            
+            # Формат пикселей (декодируется без преобразования), кодировки и
+            # первый полный запрос обновления уходят одним sendall
+            self.socket.sendall(
+                self._pixel_format_message()
+                + self._encodings_message()
+                + self._update_request_full
+            )
+            self.pixel_format = self._parse_pixel_format(self.CLIENT_PIXEL_FORMAT)
+            logger.debug("Set pixel format: 32bpp BGRX")
             
             return True
             
         except Exception as e:
-            logger.error(f"Initialization error: {e}")
+            logger.error("Initialization error: %s", e)
             return False
     
     def _parse_pixel_format(self, data: bytes) -> Dict[str, Any]:
-        """Парсинг формата пикселей."""
-        return {
-            'bits_per_pixel': data[0],
-            'depth': data[1],
-            'big_endian': bool(data[2]),
-            'true_color': bool(data[3]),
-            'red_max': struct.unpack("!H", data[4:6])[0],
-            'green_max': struct.unpack("!H", data[6:8])[0],
-            'blue_max': struct.unpack("!H", data[8:10])[0],
-            'red_shift': data[10],
-            'green_shift': data[11],
-            'blue_shift': data[12]
+        """Парсинг формата пикселей.
+        
+        Производные размеры CPIXEL/TPIXEL вычисляются здесь один раз,
+        а не при разборе каждого прямоугольника.
+        """
+        (bits_per_pixel, depth, big_endian, true_color,
+         red_max, green_max, blue_max,
+         red_shift, green_shift, blue_shift) = self._PIXEL_FORMAT.unpack(data)
+        pf = {
+            'bits_per_pixel': bits_per_pixel,
+            'depth': depth,
+            'big_endian': bool(big_endian),
+            'true_color': bool(true_color),
+            'red_max': red_max,
+            'green_max': green_max,
+            'blue_max': blue_max,
+            'red_shift': red_shift,
+            'green_shift': green_shift,
+            'blue_shift': blue_shift
         }
+        
+        bytes_per_pixel = pf['bits_per_pixel'] // 8
+        pf['bytes_per_pixel'] = bytes_per_pixel
+        
+        # ZRLE CPIXEL: для 32-bit true color с глубиной до 24 бит передаются только 3 байта
+        if bytes_per_pixel == 4 and pf['true_color'] and pf['depth'] <= 24:
+            pf['cpixel_size'] = 3
+        else:
+            pf['cpixel_size'] = bytes_per_pixel
+        
+        # Tight TPIXEL: размер и raw-режим PIL для его декодирования
+        if (pf['bits_per_pixel'] == 32 and pf['depth'] == 24 and
+                pf['red_max'] == pf['green_max'] == pf['blue_max'] == 255):
+            pf['tpixel'] = (3, 'RGB')
+        else:
+            pf['tpixel'] = (bytes_per_pixel, self._RAW_MODES.get(bytes_per_pixel))
+        
+        return pf
     
-    def _set_encodings_optimized(self):
-        """Установка оптимизированных кодировок для производительности."""
-        # ПРОИЗВОДИТЕЛЬНОСТЬ: Только самые быстрые кодировки
+    def _pixel_format_message(self) -> bytes:
+        """Сообщение SetPixelFormat с форматом CLIENT_PIXEL_FORMAT."""
+        return bytes((self.SET_PIXEL_FORMAT, 0, 0, 0)) + self.CLIENT_PIXEL_FORMAT
+    
+    def _encodings_message(self) -> bytes:
+        """Сообщение SetEncodings с оптимизированными кодировками."""
+        # ПРОИЗВОДИТЕЛЬНОСТЬ: Сжатые кодировки в порядке предпочтения,
+        # Raw остается запасным вариантом для серверов без их поддержки
         encodings = [
-            self.ENCODING_RAW,       # 0 - Быстрая основная кодировка
-            self.ENCODING_COPYRECT,  # 1 - Быстрое копирование областей
+            self.ENCODING_TIGHT,         # 7 - Фильтры + 4 zlib потока
+            self.ENCODING_ZRLE,          # 16 - zlib + RLE по тайлам 64x64
+            self.ENCODING_HEXTILE,       # 5 - Тайлы 16x16 с заливками
+            self.ENCODING_ZLIB,          # 6 - Raw, сжатый zlib
+            self.ENCODING_RRE,           # 2 - Фон + залитые прямоугольники
+            self.ENCODING_COPYRECT,      # 1 - Быстрое копирование областей
+            self.ENCODING_RAW,           # 0 - Несжатые пиксели
+            self.ENCODING_DESKTOP_SIZE,  # -223 - Смена разрешения
+            self.ENCODING_LAST_RECT,     # -224 - Конец списка прямоугольников
+            # Разрешает Tight JPEG для фотографических областей
+            self.ENCODING_JPEG_QUALITY_LEVEL_0 + self.JPEG_QUALITY_LEVEL,
         ]
         
-        message = struct.pack("!BBH", self.SET_ENCODINGS, 0, len(encodings))
-        for encoding in encodings:
-            message += struct.pack("!i", encoding)
-        
-        self.socket.send(message)
-        logger.debug(f"Set optimized encodings: {encodings}")
+        count = len(encodings)
+        logger.debug("Set optimized encodings: %s", encodings)
+        return struct.pack(f"!BBH{count}i", self.SET_ENCODINGS, 0, count, *encodings)
     
-    # ПРОИЗВОДИТЕЛЬНОСТЬ: Высокопроизводительные таймеры
-    def _start_high_performance_timers(self):
-        """Запуск стабильных таймеров."""
-        logger.info("Starting stable timers for reliable display")
-        self._schedule_continuous_update_stable()
-        self._schedule_force_update_stable()
+    def _start_update_timer(self):
+        """Запуск единого таймера запросов обновления."""
+        logger.info("Starting framebuffer update timer")
+        self._update_tick()
     
-    def _schedule_continuous_update_stable(self):
-        """СТАБИЛЬНОЕ планирование непрерывных обновлений."""
-        if not self.connected:
-            return
+    def _update_tick(self):
+        """Единый тик запросов обновления framebuffer.
         
-        # СТАБИЛЬНОСТЬ: Консервативные запросы
-        if (self.continuous_var.get() and 
-            self.pending_update_requests < 1):  # Максимум 1 pending для стабильности
-            self._request_framebuffer_update_stable(incremental=True)
-        
-        # Стабильное повторение
-        if self.connected:
-            self.continuous_update_timer = self.after(50, self._schedule_continuous_update_stable)  # 20 FPS
-    
-    def _schedule_force_update_stable(self):
-        """СТАБИЛЬНОЕ планирование принудительных обновлений."""
+        Полный запрос отправляется только если сервер долго молчит,
+        иначе - incremental, когда нет ожидающих ответа запросов.
+        """
+        self.update_timer = None
         if not self.connected:
             return
         
-        current_time = time.time()
-        
-        # НОВОЕ: Автоматическое обновление если долго нет framebuffer updates
-        time_since_last_frame = current_time - getattr(self, 'last_framebuffer_time', current_time)
+        current_time = time.monotonic()
+        time_since_last_frame = current_time - self.last_framebuffer_time
         
-        if time_since_last_frame > 2.0:  # Если 2+ секунд без обновлений
-            logger.info(f"No framebuffer updates for {time_since_last_frame:.1f}s, forcing refresh")
+        if time_since_last_frame > self.server_response_timeout:
+            logger.info("No framebuffer updates for %.1fs, forcing refresh", time_since_last_frame)
             self._force_screen_refresh()
             self.last_framebuffer_time = current_time
-        elif (current_time - self.last_force_update >= self.force_update_interval and 
-              self.pending_update_requests < 1):
-            self._request_framebuffer_update_stable(incremental=False)
-            self.last_force_update = current_time
+        elif self.pending_update_requests < 1:
+            self._request_framebuffer_update_stable(incremental=True)
         
-        if self.connected:
-            self.force_update_timer = self.after(200, self._schedule_force_update_stable)  # 5 FPS
+        # Непрерывный режим опрашивает сервер чаще
+        if self.continuous_var.get():
+            interval = self.continuous_update_interval
+        else:
+            interval = self.force_update_interval
+        self.update_timer = self.after(int(interval * 1000), self._update_tick)
+    
+    def _input_update_request(self) -> bytes:
+        """Incremental запрос обновления для отправки вместе с событием ввода.
+        
+        Запрос добавляется, только если предыдущий уже выполнен: при серии
+        кликов новые запросы лишь копились бы в очереди сервера. Таймер
+        обновлений и полное обновление этим условием не ограничены.
+        
+        Returns:
+            Готовое сообщение или b'', если запрос сейчас не нужен
+            (throttling или уже есть ожидающие ответа запросы)
+        """
+        if self.pending_update_requests >= 1:
+            # Текущий запрос покроет и это событие; после его завершения
+            # будет отправлен один дополнительный запрос
+            self._update_request_deferred = True
+            return b''
+        if time.monotonic() - self.last_update_request_time < self.update_request_interval:
+            return b''
+        return self._update_request_incremental
     
-    def _request_framebuffer_update_fast(self, incremental: bool = True):
-        """БЫСТРЫЙ запрос обновления framebuffer без throttling."""
-        if not self.connected or not self.socket:
-            return
-        
-        current_time = time.time()
+    def _send_deferred_update_request(self):
+        """Отправка запроса обновления, отложенного событием ввода.
         
-        # ПРОИЗВОДИТЕЛЬНОСТЬ: Минимальный throttling
-        if current_time - self.last_update_request_time < self.update_request_interval:
+        Запрос уже ждал завершения предыдущего, поэтому throttling к нему
+        не применяется. Флаг сбрасывается только после отправки; если
+        тем временем ушел запрос таймера, флаг обработает его завершение.
+        """
+        if not self._update_request_deferred or self.pending_update_requests >= 1:
             return
-        
-        # ПРОИЗВОДИТЕЛЬНОСТЬ: Упрощенный контроль pending
-        if self.pending_update_requests >= self.max_pending_requests:
+        if not self.connected or not self.socket:
             return
         
         try:
-            if self.socket.fileno() == -1:
-                return
-            
-            message = struct.pack(
-                "!BBHHHH",
-                self.FRAMEBUFFER_UPDATE_REQUEST,
-                1 if incremental else 0,
-                0, 0,
-                self.screen_width, self.screen_height
-            )
-            
-            self.socket.send(message)
-            self.pending_update_requests += 1
-            self.last_update_request_time = current_time
-            
-        except (OSError, socket.error):
-            self.pending_update_requests = 0
-        except Exception:
-            self.pending_update_requests = 0
+            self.socket.sendall(self._update_request_incremental)
+        except OSError as e:
+            logger.debug("Socket error in deferred update request: %s", e)
+            return
+        self._update_request_deferred = False
+        self._update_request_sent()
+    
+    def _update_request_sent(self):
+        """Учет отправленного вместе с событием ввода запроса обновления."""
+        self.pending_update_requests += 1
+        self.last_update_request_time = time.monotonic()
+    
+    def _rebuild_update_requests(self):
+        """Сборка сообщений FramebufferUpdateRequest на весь экран.
+        
+        Сообщения зависят только от разрешения, поэтому собираются при его
+        смене, а не при каждом запросе обновления.
+        """
+        self._update_request_incremental = self._UPDATE_REQUEST.pack(
+            self.FRAMEBUFFER_UPDATE_REQUEST, 1, 0, 0, self.screen_width, self.screen_height)
+        self._update_request_full = self._UPDATE_REQUEST.pack(
+            self.FRAMEBUFFER_UPDATE_REQUEST, 0, 0, 0, self.screen_width, self.screen_height)
     
     def _start_receiver_thread(self):
         """Запуск потока приёма данных."""
@@ -652,7 +925,13 @@ class VNCViewerFrame(ctk.CTkFrame):
         consecutive_errors = 0
         max_consecutive_errors = 3
         unknown_message_count = 0
-        last_unknown_reset = time.time()
+        last_unknown_reset = time.monotonic()
+        protocol_error = None
+        
+        # Ожидание данных через selector вместо блокирующего recv с таймаутом:
+        # остановка потока замечается за RECEIVE_POLL_INTERVAL
+        selector = selectors.DefaultSelector()
+        selector.register(self.socket, selectors.EVENT_READ)
         
         while self.connected and not self._stop_threads.is_set():
             try:
@@ -671,10 +950,10 @@ class VNCViewerFrame(ctk.CTkFrame):
                     break
                 
                 # Сброс счетчика неизвестных сообщений каждые 5 секунд
-                current_time = time.time()
+                current_time = time.monotonic()
                 if current_time - last_unknown_reset > 5:
                     if unknown_message_count > 10:
-                        logger.warning(f"Reset unknown message count: {unknown_message_count}")
+                        logger.warning("Reset unknown message count: %s", unknown_message_count)
                     unknown_message_count = 0
                     last_unknown_reset = current_time
                 
@@ -685,9 +964,13 @@ class VNCViewerFrame(ctk.CTkFrame):
                     self.after(0, lambda: self._request_framebuffer_update_stable(incremental=False))
                     time.sleep(0.1)  # Небольшая пауза
                 
+                # Новое сообщение начинаем читать только когда данные уже пришли
+                if self._rx_head == self._rx_tail and not selector.select(self.RECEIVE_POLL_INTERVAL):
+                    continue
+                
                 # Быстрое чтение типа сообщения с обработкой ошибок
                 try:
-                    msg_type_data = self.socket.recv(1)
+                    has_data = self._rx_head < self._rx_tail or self._fill_rx_buffer()
                 except OSError as e:
                     if e.winerror == 10038:  # Socket operation on non-socket
                         logger.debug("Socket closed during recv")
@@ -698,11 +981,12 @@ class VNCViewerFrame(ctk.CTkFrame):
                     else:
                         raise
                 
-                if not msg_type_data:
+                if not has_data:
                     logger.debug("Empty message received, connection closed")
                     break
                 
-                message_type = struct.unpack("!B", msg_type_data)[0]
+                message_type = self._rx_buf[self._rx_head]
+                self._rx_head += 1
                 
                 if message_type == self.FRAMEBUFFER_UPDATE:
                     self._handle_framebuffer_update_stable()
@@ -720,13 +1004,14 @@ class VNCViewerFrame(ctk.CTkFrame):
                         unknown_message_count += 1
                         # Вместо вызова метода просто логируем и пропускаем
                         if unknown_message_count % 50 == 1:
-                            logger.debug(f"UltraVNC extension {message_type} (count: {unknown_message_count})")
+                            logger.debug("UltraVNC extension %s (count: %s)", message_type, unknown_message_count)
                         continue
                     else:
-                        unknown_message_count += 1
-                        logger.warning(f"Truly unknown message type: {message_type}")
-                        # Пытаемся продолжить без чтения дополнительных данных
-                        continue
+                        # Длина неизвестного сообщения не известна, границу
+                        # следующего сообщения не найти - разбор потока невозможен
+                        logger.error("Unknown message type %s, closing connection", message_type)
+                        protocol_error = f"Неизвестный тип сообщения сервера: {message_type}"
+                        break
             
             except socket.timeout:
                 # Таймаут - это нормально, продолжаем
@@ -745,7 +1030,7 @@ class VNCViewerFrame(ctk.CTkFrame):
                     logger.info("Connection reset by peer")
                     break
                 else:
-                    logger.error(f"OS error in receive loop: {e}")
+                    logger.error("OS error in receive loop: %s", e)
                     consecutive_errors += 1
                     if consecutive_errors >= max_consecutive_errors:
                         logger.error("Too many consecutive OS errors, breaking")
@@ -754,7 +1039,7 @@ class VNCViewerFrame(ctk.CTkFrame):
                     continue
             except Exception as e:
                 consecutive_errors += 1
-                logger.error(f"Unexpected error in receive loop: {e}")
+                logger.error("Unexpected error in receive loop: %s", e)
                 if consecutive_errors >= max_consecutive_errors:
                     logger.error("Too many consecutive errors, breaking")
                     break
@@ -763,66 +1048,73 @@ class VNCViewerFrame(ctk.CTkFrame):
                 time.sleep(0.1)
                 continue
         
+        selector.close()
         logger.info("Receive loop ended")
         self.connected = False
         self._update_status("Соединение разорвано")
         self.after(0, self.disconnect_from_vnc)
+        if protocol_error:
+            self.after(0, self._on_connection_lost, protocol_error)
     
     def _handle_framebuffer_update_stable(self):
         """СТАБИЛЬНАЯ обработка обновления framebuffer."""
         try:
-            current_time = time.time()
-            
-            # Уменьшаем pending запросы
-            if self.pending_update_requests > 0:
-                self.pending_update_requests -= 1
+            current_time = time.monotonic()
             self.last_server_response_time = current_time
             
             # Пропускаем padding
             self._recv_exact(1)
             
             # Количество прямоугольников
-            num_rectangles = struct.unpack("!H", self._recv_exact(2))[0]
+            num_rectangles = self._recv_struct(self._U16)[0]
             
             # СТАБИЛЬНОСТЬ: Ограничиваем количество прямоугольников для предотвращения зависания
-            if num_rectangles > 1000:
-                logger.warning(f"Too many rectangles: {num_rectangles}, limiting to 1000")
+            # (0xFFFF означает, что конец списка отмечен LastRect)
+            if 1000 < num_rectangles < 0xFFFF:
+                logger.warning("Too many rectangles: %s, limiting to 1000", num_rectangles)
                 num_rectangles = 1000
             
             rectangles_processed = 0
+            rect_handlers = self._rect_handlers
+            dirty_rects = []
             
             # Обрабатываем прямоугольники более консервативно
             for i in range(num_rectangles):
                 try:
-                    rect_data = self._recv_exact(8)
-                    x, y, w, h = struct.unpack("!HHHH", rect_data)
+                    x, y, w, h, encoding = self._recv_struct(self._RECT_HEADER)
                     
-                    encoding = struct.unpack("!i", self._recv_exact(4))[0]
+                    # Pseudo-encodings не несут пикселей
+                    if encoding == self.ENCODING_LAST_RECT:
+                        break
+                    if encoding == self.ENCODING_DESKTOP_SIZE:
+                        self._handle_desktop_size(w, h)
+                        rectangles_processed += 1
+                        continue
                     
                     # СТАБИЛЬНОСТЬ: Проверяем размеры прямоугольника
                     if w <= 0 or h <= 0 or w > self.screen_width or h > self.screen_height:
-                        logger.warning(f"Invalid rectangle size: {w}x{h}")
+                        logger.warning("Invalid rectangle size: %sx%s", w, h)
                         continue
                     
-                    if encoding == self.ENCODING_RAW:
-                        self._handle_raw_rectangle_stable(x, y, w, h)
-                        rectangles_processed += 1
-                    elif encoding == self.ENCODING_COPYRECT:
-                        self._handle_copyrect_fast(x, y, w, h)
+                    handler = rect_handlers.get(encoding)
+                    if handler is not None:
+                        handler(x, y, w, h)
                         rectangles_processed += 1
+                        
+                        self._add_dirty_rect(dirty_rects, x, y, x + w, y + h)
                     else:
                         # Пропускаем неподдерживаемые кодировки
-                        bytes_per_pixel = self.pixel_format['bits_per_pixel'] // 8
+                        bytes_per_pixel = self.pixel_format['bytes_per_pixel']
                         skip_size = w * h * bytes_per_pixel
                         if skip_size > 0 and skip_size < 100000000:  # Увеличенный лимит
-                            logger.debug(f"Skipping unsupported encoding {encoding}, size: {skip_size}")
+                            logger.debug("Skipping unsupported encoding %s, size: %s", encoding, skip_size)
                             self._recv_exact(skip_size)
                         else:
-                            logger.error(f"Skipping invalid rectangle size: {skip_size}")
+                            logger.error("Skipping invalid rectangle size: %s", skip_size)
                             break
                             
                 except Exception as e:
-                    logger.error(f"Error processing rectangle {i}: {e}")
+                    logger.error("Error processing rectangle %s: %s", i, e)
                     # При ошибке прерываем обработку этого update
                     break
             
@@ -831,54 +1123,121 @@ class VNCViewerFrame(ctk.CTkFrame):
                 # НОВОЕ: Отмечаем время получения реальных данных
                 self.last_framebuffer_time = current_time
                 
-                self._schedule_canvas_update_stable()
+                if dirty_rects:
+                    self._merge_dirty_rects(dirty_rects)
+                    self._prepare_display_region()
+                
+                # Перерисовка выполняется в UI потоке; пока она не началась,
+                # новые обновления объединяются в одну
+                self._display_pending = True
+                self._wake_ui()
                 
                 # Статистика
-                self.frame_count += 1
                 self.update_count += 1
             
-            # СТАБИЛЬНОСТЬ: Более осторожная стратегия запросов
-            if (self.continuous_var.get() and 
-                self.pending_update_requests < 1 and  # Ограничиваем до 1
-                rectangles_processed > 0):  # Запрашиваем только если получили данные
-                self.after(50, lambda: self._request_framebuffer_update_stable(incremental=True))
-            
         except Exception as e:
-            logger.error(f"Stable framebuffer update error: {e}")
+            logger.error("Stable framebuffer update error: %s", e)
+        finally:
+            # Запрос считается выполненным, когда update разобран целиком
             if self.pending_update_requests > 0:
                 self.pending_update_requests -= 1
+            if self._update_request_deferred and self.pending_update_requests == 0:
+                self.after(0, self._send_deferred_update_request)
+    
+    def _add_dirty_rect(self, rects: list, x1: int, y1: int, x2: int, y2: int):
+        """Добавление области в список измененных.
+        
+        Область объединяется с соседней, если их общая рамка почти не больше
+        суммы площадей; далекие друг от друга области (часы, курсор)
+        остаются раздельными и не тянут за собой перерисовку всего экрана.
+        """
+        area = (x2 - x1) * (y2 - y1)
+        for i, (rx1, ry1, rx2, ry2) in enumerate(rects):
+            ux1, uy1 = min(x1, rx1), min(y1, ry1)
+            ux2, uy2 = max(x2, rx2), max(y2, ry2)
+            if (ux2 - ux1) * (uy2 - uy1) <= area + (rx2 - rx1) * (ry2 - ry1) + self.DIRTY_MERGE_SLACK:
+                del rects[i]
+                # Расширенная область может поглотить и другие
+                self._add_dirty_rect(rects, ux1, uy1, ux2, uy2)
+                return
+        
+        rects.append((x1, y1, x2, y2))
+        if len(rects) > self.MAX_DIRTY_RECTS:
+            union = (min(r[0] for r in rects), min(r[1] for r in rects),
+                     max(r[2] for r in rects), max(r[3] for r in rects))
+            rects[:] = [union]
+    
+    def _merge_dirty_rects(self, rects: list):
+        """Объединение областей обновления с еще не отрисованными."""
+        with self._dirty_lock:
+            dirty_rects = self._dirty_rects
+            for rect in rects:
+                self._add_dirty_rect(dirty_rects, *rect)
+    
+    def _take_dirty_region(self) -> Tuple[list, Optional[tuple]]:
+        """Получение и сброс накопленных областей и подготовленных для них изображений."""
+        with self._dirty_lock:
+            dirty_rects = self._dirty_rects
+            prepared = self._prepared_region
+            self._dirty_rects = []
+            self._prepared_region = None
+        
+        # Подготовленные области годятся, только если покрывают все накопленные
+        if prepared is None or prepared[0] != dirty_rects:
+            return dirty_rects, None
+        return dirty_rects, prepared[1]
+    
+    def _prepare_display_region(self):
+        """Crop/масштабирование измененной области в потоке приёма.
+        
+        UI потоку остается только скопировать готовую область в PhotoImage.
+        """
+        size = self._display_size
+        with self._dirty_lock:
+            dirty_rects = list(self._dirty_rects)
+        if size is None or not dirty_rects:
+            return
+        
+        rendered = self._render_regions(dirty_rects, size)
+        with self._dirty_lock:
+            if self._dirty_rects == dirty_rects:
+                self._prepared_region = (dirty_rects, rendered)
     
     def _handle_raw_rectangle_stable(self, x: int, y: int, w: int, h: int):
         """СТАБИЛЬНАЯ обработка RAW прямоугольника."""
-        bytes_per_pixel = self.pixel_format['bits_per_pixel'] // 8
+        bytes_per_pixel = self.pixel_format['bytes_per_pixel']
         data_size = w * h * bytes_per_pixel
         
         # Логируем большие прямоугольники для отладки
         if data_size > 5000000:  # 5MB+
-            logger.info(f"Processing large rectangle: {w}x{h}, {data_size/1024/1024:.1f}MB")
+            logger.info("Processing large rectangle: %sx%s, %.1fMB", w, h, data_size/1024/1024)
         
         # Читаем данные с проверкой
         try:
             pixel_data = self._recv_exact(data_size)
         except Exception as e:
-            logger.error(f"Error reading raw rectangle data: {e}")
+            logger.error("Error reading raw rectangle data: %s", e)
             raise
         
+        # Полноэкранный прямоугольник декодируется прямо в framebuffer
+        # (raw-декодер PIL в C, без промежуточного изображения и paste)
+        framebuffer = self.framebuffer
+        raw_mode = self._RAW_MODES.get(bytes_per_pixel)
+        if (raw_mode is not None and len(pixel_data) == data_size
+                and (x, y, w, h) == (0, 0, framebuffer.width, framebuffer.height)):
+            framebuffer.frombytes(pixel_data, 'raw', raw_mode)
+            return
+        
         # СТАБИЛЬНОСТЬ: Создаем изображение более безопасно
         try:
-            if bytes_per_pixel == 4:  # 32-bit
-                rect_image = self._create_image_stable_32bit(pixel_data, w, h)
-            elif bytes_per_pixel == 3:  # 24-bit
-                rect_image = self._create_image_stable_24bit(pixel_data, w, h)
-            else:  # Для других форматов
-                rect_image = Image.new('RGB', (w, h), (128, 128, 128))
+            rect_image = self._create_rect_image(pixel_data, w, h, bytes_per_pixel)
             
             # Безопасная вставка в framebuffer
             if rect_image and self.framebuffer:
                 self.framebuffer.paste(rect_image, (x, y))
                 
         except Exception as e:
-            logger.error(f"Error creating rectangle image: {e}")
+            logger.error("Error creating rectangle image: %s", e)
             # При ошибке создаем простую заглушку
             try:
                 rect_image = Image.new('RGB', (w, h), (64, 64, 64))
@@ -886,124 +1245,479 @@ class VNCViewerFrame(ctk.CTkFrame):
             except:
                 pass  # Игнорируем ошибки заглушки
     
-    def _create_image_stable_32bit(self, pixel_data: bytes, w: int, h: int) -> Image.Image:
-        """СТАБИЛЬНОЕ создание изображения из 32-bit данных."""
-        try:
-            rect_image = Image.new('RGB', (w, h))
-            
-            pixels = []
-            data_len = len(pixel_data)
-            
-            # Проверяем размер данных
-            expected_size = w * h * 4
-            if data_len < expected_size:
-                logger.warning(f"Insufficient pixel data: got {data_len}, expected {expected_size}")
-                return Image.new('RGB', (w, h), (128, 128, 128))
-            
-            # Безопасная обработка пикселей
-            for i in range(0, min(data_len, expected_size), 4):
-                if i + 3 < data_len:
-                    try:
-                        b, g, r, _ = pixel_data[i:i+4]
-                        pixels.append((r, g, b))
-                    except (IndexError, ValueError):
-                        pixels.append((128, 128, 128))  # Заглушка при ошибке
-            
-            if pixels:
-                # Проверяем количество пикселей
-                expected_pixels = w * h
-                if len(pixels) < expected_pixels:
-                    # Дополняем недостающие пиксели
-                    pixels.extend([(128, 128, 128)] * (expected_pixels - len(pixels)))
-                elif len(pixels) > expected_pixels:
-                    # Обрезаем лишние пиксели
-                    pixels = pixels[:expected_pixels]
+    def _create_rect_image(self, pixel_data: bytes, w: int, h: int, bytes_per_pixel: int) -> Image.Image:
+        """Создание изображения прямоугольника без попиксельной обработки.
+        
+        Данные оборачиваются через Image.frombuffer с raw-декодером PIL,
+        перестановка каналов BGR(X) -> RGB выполняется в C.
+        """
+        expected_size = w * h * bytes_per_pixel
+        if len(pixel_data) < expected_size:
+            logger.warning("Insufficient pixel data: got %s, expected %s", len(pixel_data), expected_size)
+            return Image.new('RGB', (w, h), (128, 128, 128))
+        
+        raw_mode = self._RAW_MODES.get(bytes_per_pixel)
+        if raw_mode is None:  # Для других форматов
+            return Image.new('RGB', (w, h), (128, 128, 128))
+        
+        return Image.frombuffer('RGB', (w, h), pixel_data, 'raw', raw_mode, 0, 1)
+    
+    def _pixel_to_rgb(self, pixel: bytes) -> Tuple[int, int, int]:
+        """Преобразование одного пикселя BGR(X) в цвет RGB."""
+        if len(pixel) >= 3:
+            return pixel[2], pixel[1], pixel[0]
+        return 128, 128, 128
+    
+    def _handle_hextile_rectangle(self, x: int, y: int, w: int, h: int):
+        """Обработка HEXTILE прямоугольника (тайлы 16x16)."""
+        bytes_per_pixel = self.pixel_format['bytes_per_pixel']
+        framebuffer = self.framebuffer
+        background = foreground = (0, 0, 0)
+        
+        for tile_y in range(y, y + h, 16):
+            tile_h = min(16, y + h - tile_y)
+            for tile_x in range(x, x + w, 16):
+                tile_w = min(16, x + w - tile_x)
+                subencoding = self._recv_struct(self._U8)[0]
+                
+                if subencoding & self.HEXTILE_RAW:
+                    pixel_data = self._recv_exact(tile_w * tile_h * bytes_per_pixel)
+                    framebuffer.paste(
+                        self._create_rect_image(pixel_data, tile_w, tile_h, bytes_per_pixel),
+                        (tile_x, tile_y)
+                    )
+                    continue
+                
+                if subencoding & self.HEXTILE_BACKGROUND:
+                    background = self._pixel_to_rgb(self._recv_exact(bytes_per_pixel))
+                if subencoding & self.HEXTILE_FOREGROUND:
+                    foreground = self._pixel_to_rgb(self._recv_exact(bytes_per_pixel))
                 
-                rect_image.putdata(pixels)
+                framebuffer.paste(background, (tile_x, tile_y, tile_x + tile_w, tile_y + tile_h))
+                
+                if not subencoding & self.HEXTILE_ANY_SUBRECTS:
+                    continue
+                
+                num_subrects = self._recv_struct(self._U8)[0]
+                coloured = subencoding & self.HEXTILE_SUBRECTS_COLOURED
+                subrect_size = bytes_per_pixel + 2 if coloured else 2
+                data = self._recv_exact(num_subrects * subrect_size)
+                
+                color = foreground
+                offset = 0
+                for _ in range(num_subrects):
+                    if coloured:
+                        color = self._pixel_to_rgb(data[offset:offset + bytes_per_pixel])
+                        offset += bytes_per_pixel
+                    xy, wh = data[offset], data[offset + 1]
+                    offset += 2
+                    sub_x = tile_x + (xy >> 4)
+                    sub_y = tile_y + (xy & 0x0F)
+                    framebuffer.paste(color, (sub_x, sub_y, sub_x + (wh >> 4) + 1, sub_y + (wh & 0x0F) + 1))
+    
+    def _handle_rre_rectangle(self, x: int, y: int, w: int, h: int):
+        """Обработка RRE прямоугольника (фон + залитые подпрямоугольники)."""
+        bytes_per_pixel = self.pixel_format['bytes_per_pixel']
+        num_subrects = self._recv_struct(self._U32)[0]
+        background = self._pixel_to_rgb(self._recv_exact(bytes_per_pixel))
+        
+        framebuffer = self.framebuffer
+        framebuffer.paste(background, (x, y, x + w, y + h))
+        if not num_subrects:
+            return
+        
+        # Все подпрямоугольники читаются одним блоком, заливка - paste в C
+        subrect = self._RRE_SUBRECT[bytes_per_pixel]
+        data = self._recv_exact(num_subrects * subrect.size)
+        for pixel, sub_x, sub_y, sub_w, sub_h in subrect.iter_unpack(data):
+            sub_x += x
+            sub_y += y
+            framebuffer.paste(self._pixel_to_rgb(pixel), (sub_x, sub_y, sub_x + sub_w, sub_y + sub_h))
+    
+    def _handle_zlib_rectangle(self, x: int, y: int, w: int, h: int):
+        """Обработка ZLIB прямоугольника (Raw данные, сжатые zlib)."""
+        bytes_per_pixel = self.pixel_format['bytes_per_pixel']
+        length = self._recv_struct(self._U32)[0]
+        pixel_data = self._zlib_stream.decompress(self._recv_exact(length))
+        self.framebuffer.paste(self._create_rect_image(pixel_data, w, h, bytes_per_pixel), (x, y))
+    
+    def _handle_zrle_rectangle(self, x: int, y: int, w: int, h: int):
+        """Обработка ZRLE прямоугольника (тайлы 64x64)."""
+        length = self._recv_struct(self._U32)[0]
+        data = self._zrle_stream.decompress(self._recv_exact(length))
+        
+        cpixel_size = self.pixel_format['cpixel_size']
+        raw_mode = self._RAW_MODES[cpixel_size]
+        
+        framebuffer = self.framebuffer
+        offset = 0
+        
+        for tile_y in range(y, y + h, 64):
+            tile_h = min(64, y + h - tile_y)
+            for tile_x in range(x, x + w, 64):
+                tile_w = min(64, x + w - tile_x)
+                subencoding = data[offset]
+                offset += 1
+                
+                if subencoding == 0:
+                    # Raw
+                    size = tile_w * tile_h * cpixel_size
+                    tile = Image.frombuffer('RGB', (tile_w, tile_h), data[offset:offset + size], 'raw', raw_mode, 0, 1)
+                    offset += size
+                    framebuffer.paste(tile, (tile_x, tile_y))
+                
+                elif subencoding == 1:
+                    # Solid
+                    color = self._pixel_to_rgb(data[offset:offset + cpixel_size])
+                    offset += cpixel_size
+                    framebuffer.paste(color, (tile_x, tile_y, tile_x + tile_w, tile_y + tile_h))
+                
+                elif subencoding <= 16:
+                    # Packed palette: индексы по 1/2/4 бита, строки выровнены по байту
+                    palette_end = offset + subencoding * cpixel_size
+                    palette = data[offset:palette_end]
+                    offset = palette_end
+                    
+                    bits = 1 if subencoding == 2 else 2 if subencoding <= 4 else 4
+                    size = (tile_w * bits + 7) // 8 * tile_h
+                    tile = Image.frombuffer('P', (tile_w, tile_h), data[offset:offset + size], 'raw', f'P;{bits}', 0, 1)
+                    offset += size
+                    tile.putpalette(self._cpixels_to_rgb_palette(palette, cpixel_size))
+                    framebuffer.paste(tile.convert('RGB'), (tile_x, tile_y))
+                
+                elif subencoding == 128 or subencoding >= 130:
+                    # Plain RLE / palette RLE: тайл собирается из повторов CPIXEL
+                    palette = None
+                    if subencoding >= 130:
+                        palette_end = offset + (subencoding - 128) * cpixel_size
+                        palette = [data[i:i + cpixel_size] for i in range(offset, palette_end, cpixel_size)]
+                        offset = palette_end
+                    
+                    total = tile_w * tile_h
+                    filled = 0
+                    tile_data = bytearray()
+                    while filled < total:
+                        if palette is None:
+                            pixel = data[offset:offset + cpixel_size]
+                            offset += cpixel_size
+                            run = 1
+                            has_run = True
+                        else:
+                            index = data[offset]
+                            offset += 1
+                            pixel = palette[index & 0x7F]
+                            run = 1
+                            has_run = index & 0x80
+                        if has_run:
+                            while data[offset] == 255:
+                                run += 255
+                                offset += 1
+                            run += data[offset]
+                            offset += 1
+                        tile_data += pixel * run
+                        filled += run
+                    
+                    tile = Image.frombuffer('RGB', (tile_w, tile_h), bytes(tile_data), 'raw', raw_mode, 0, 1)
+                    framebuffer.paste(tile, (tile_x, tile_y))
+                
+                else:
+                    raise ValueError(f"Invalid ZRLE subencoding: {subencoding}")
+    
+    def _handle_tight_rectangle(self, x: int, y: int, w: int, h: int):
+        """Обработка TIGHT прямоугольника."""
+        control = self._recv_struct(self._U8)[0]
+        
+        # Младшие 4 бита - сброс соответствующих zlib потоков
+        for stream_id in range(4):
+            if control & (1 << stream_id):
+                self._tight_streams[stream_id] = zlib_impl.decompressobj()
+        
+        compression = control >> 4
+        tpixel_size, raw_mode = self.pixel_format['tpixel']
+        
+        if compression == self.TIGHT_FILL:
+            color = self._tpixel_to_rgb(self._recv_exact(tpixel_size), raw_mode)
+            self.framebuffer.paste(color, (x, y, x + w, y + h))
+            return
+        
+        if compression == self.TIGHT_JPEG:
+            self._handle_tight_jpeg(x, y, w, h)
+            return
+        
+        if compression & 0x08:
+            raise ValueError(f"Unsupported Tight compression: {compression:#x}")
+        
+        # Basic compression
+        stream_id = compression & 0x03
+        filter_id = self.TIGHT_FILTER_COPY
+        if compression & self.TIGHT_EXPLICIT_FILTER:
+            filter_id = self._recv_struct(self._U8)[0]
+        
+        if filter_id == self.TIGHT_FILTER_PALETTE:
+            num_colors = self._recv_struct(self._U8)[0] + 1
+            palette = self._recv_exact(num_colors * tpixel_size)
+            bits = 1 if num_colors == 2 else 8
+            data = self._read_tight_data(stream_id, (w * bits + 7) // 8 * h)
+            
+            tile = Image.frombuffer('P', (w, h), data, 'raw', 'P;1' if bits == 1 else 'P', 0, 1)
+            rgb_palette = []
+            for i in range(0, len(palette), tpixel_size):
+                rgb_palette.extend(self._tpixel_to_rgb(palette[i:i + tpixel_size], raw_mode))
+            tile.putpalette(rgb_palette)
+            self.framebuffer.paste(tile.convert('RGB'), (x, y))
+            
+        elif filter_id == self.TIGHT_FILTER_COPY:
+            data = self._read_tight_data(stream_id, w * h * tpixel_size)
+            self.framebuffer.paste(
+                Image.frombuffer('RGB', (w, h), data, 'raw', raw_mode, 0, 1),
+                (x, y)
+            )
             
-            return rect_image
+        elif filter_id == self.TIGHT_FILTER_GRADIENT:
+            if tpixel_size != 3:
+                raise ValueError("Tight gradient filter requires 24-bit TPIXEL")
+            data = self._read_tight_data(stream_id, w * h * 3)
+            self.framebuffer.paste(self._tight_gradient_decode(data, w, h), (x, y))
             
-        except Exception as e:
-            logger.error(f"Error in stable 32bit image creation: {e}")
-            return Image.new('RGB', (w, h), (64, 64, 64))
+        else:
+            raise ValueError(f"Unknown Tight filter: {filter_id}")
     
-    def _create_image_stable_24bit(self, pixel_data: bytes, w: int, h: int) -> Image.Image:
-        """СТАБИЛЬНОЕ создание изображения из 24-bit данных."""
-        try:
-            rect_image = Image.new('RGB', (w, h))
-            
-            pixels = []
-            data_len = len(pixel_data)
-            expected_size = w * h * 3
-            
-            if data_len < expected_size:
-                logger.warning(f"Insufficient 24bit pixel data: got {data_len}, expected {expected_size}")
-                return Image.new('RGB', (w, h), (128, 128, 128))
-            
-            for i in range(0, min(data_len, expected_size), 3):
-                if i + 2 < data_len:
-                    try:
-                        b, g, r = pixel_data[i:i+3]
-                        pixels.append((r, g, b))
-                    except (IndexError, ValueError):
-                        pixels.append((128, 128, 128))
-            
-            if pixels:
-                expected_pixels = w * h
-                if len(pixels) < expected_pixels:
-                    pixels.extend([(128, 128, 128)] * (expected_pixels - len(pixels)))
-                elif len(pixels) > expected_pixels:
-                    pixels = pixels[:expected_pixels]
+    def _handle_tight_jpeg(self, x: int, y: int, w: int, h: int):
+        """Декодирование JPEG подкодировки Tight прямо в framebuffer."""
+        jpeg_data = self._recv_exact(self._read_tight_compact_length())
+        
+        # JPEG данные самодостаточны (в отличие от zlib потоков), поэтому
+        # повторяющиеся области можно брать из кэша без декодирования
+        if not self.image_cache_enabled or w * h > self.JPEG_CACHE_MAX_PIXELS:
+            self.framebuffer.paste(self._decode_tight_jpeg(jpeg_data, w, h), (x, y))
+            return
+        
+        cache = self.image_cache
+        key = (self.ENCODING_TIGHT, w, h, hashlib.blake2b(jpeg_data, digest_size=16).digest())
+        image = cache.get(key)
+        if image is not None:
+            cache.move_to_end(key)
+        else:
+            image = self._decode_tight_jpeg(jpeg_data, w, h)
+            cache[key] = image
+            if len(cache) > self.JPEG_CACHE_SIZE:
+                cache.popitem(last=False)
+        self.framebuffer.paste(image, (x, y))
+    
+    def _decode_tight_jpeg(self, jpeg_data: bytes, w: int, h: int) -> Image.Image:
+        """Декодирование JPEG в RGB изображение."""
+        image = Image.open(io.BytesIO(jpeg_data))
+        image.draft('RGB', (w, h))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
+    
+    def _tpixel_to_rgb(self, pixel: bytes, raw_mode: str) -> Tuple[int, int, int]:
+        """Преобразование TPIXEL в цвет RGB."""
+        if raw_mode == 'RGB':
+            return pixel[0], pixel[1], pixel[2]
+        return self._pixel_to_rgb(pixel)
+    
+    def _read_tight_data(self, stream_id: int, size: int) -> bytes:
+        """Чтение данных Tight: короткие блоки идут без сжатия."""
+        if size < self.TIGHT_MIN_TO_COMPRESS:
+            return self._recv_exact(size)
+        
+        length = self._read_tight_compact_length()
+        data = self._tight_streams[stream_id].decompress(self._recv_exact(length))
+        if len(data) != size:
+            raise ValueError(f"Tight data size mismatch: got {len(data)}, expected {size}")
+        return data
+    
+    def _read_tight_compact_length(self) -> int:
+        """Чтение compact length Tight: 1-3 байта по 7 бит."""
+        length = 0
+        for shift in (0, 7, 14):
+            byte = self._recv_struct(self._U8)[0]
+            if shift == 14:
+                length |= byte << shift
+                break
+            length |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+        return length
+    
+    def _tight_gradient_decode(self, data: bytes, w: int, h: int) -> Image.Image:
+        """Восстановление пикселей после gradient фильтра Tight.
+        
+        Пока прогноз left + up - up_left не выходит за 0..255, фильтр
+        обращается двумерной накопленной суммой разностей по модулю 256,
+        которая считается операциями Pillow над целыми блоками строк.
+        Строка, где прогноз ограничивается, декодируется побайтно.
+        """
+        row_size = w * 3
+        diff = Image.frombuffer('RGB', (w, h), data, 'raw', 'RGB', 0, 1)
+        result = Image.new('RGB', (w, h))
+        seed = None         # Последняя декодированная строка (None - нулевая)
+        y = 0
+        block = h
+        exact_run = 0       # Длина серии побайтных строк после неудачной попытки
+        exact_left = 0
+        
+        while y < h:
+            if not exact_left:
+                rows = min(block, h - y)
+                candidate = self._gradient_prefix_sum(diff.crop((0, y, w, y + rows)), seed)
+                clamped_row = self._gradient_first_clamped_row(candidate, seed)
+                if clamped_row is None:
+                    result.paste(candidate, (0, y))
+                    seed = candidate.crop((0, rows - 1, w, rows))
+                    y += rows
+                    block *= 2
+                    exact_run = 0
+                    continue
                 
-                rect_image.putdata(pixels)
-            
-            return rect_image
-            
-        except Exception as e:
-            logger.error(f"Error in stable 24bit image creation: {e}")
-            return Image.new('RGB', (w, h), (64, 64, 64))
+                # Строки до первого ограничения прогноза декодированы верно
+                if clamped_row:
+                    result.paste(candidate.crop((0, 0, w, clamped_row)), (0, y))
+                    seed = candidate.crop((0, clamped_row - 1, w, clamped_row))
+                    y += clamped_row
+                    exact_run = 0
+                else:
+                    # Попытка не дала ни строки: следующие реже
+                    exact_run = min(self.GRADIENT_MAX_EXACT_RUN, exact_run * 2 or 1)
+                exact_left = exact_run
+                block = self.GRADIENT_MIN_BLOCK
+            else:
+                exact_left -= 1
+            
+            up = seed.tobytes() if seed is not None else bytes(row_size)
+            seed = Image.frombytes('RGB', (w, 1), self._gradient_exact_row(data[y * row_size:(y + 1) * row_size], up))
+            result.paste(seed, (0, y))
+            y += 1
+        
+        return result
+    
+    def _gradient_prefix_sum(self, diff: Image.Image, seed: Optional[Image.Image]) -> Image.Image:
+        """Пиксели блока без ограничения прогноза: накопленная сумма по строкам и столбцам.
+        
+        Суммы считаются удвоением сдвига (log2(w) + log2(h) сложений по модулю 256),
+        seed - строка над блоком.
+        """
+        w, h = diff.size
+        result = diff
+        shift = 1
+        while shift < w:
+            result = ImageChops.add_modulo(result, self._shifted_image(result, shift, 0))
+            shift *= 2
+        shift = 1
+        while shift < h:
+            result = ImageChops.add_modulo(result, self._shifted_image(result, 0, shift))
+            shift *= 2
+        if seed is not None:
+            result = ImageChops.add_modulo(result, seed.resize((w, h), Image.NEAREST))
+        return result
+    
+    def _gradient_first_clamped_row(self, candidate: Image.Image, seed: Optional[Image.Image]) -> Optional[int]:
+        """Первая строка блока, где прогноз left + up - up_left выходит за 0..255."""
+        w, h = candidate.size
+        above = Image.new('RGB', (w, h))
+        if seed is not None:
+            above.paste(seed, (0, 0))
+        above.paste(candidate.crop((0, 0, w, h - 1)), (0, 1))
+        left = self._shifted_image(candidate, 1, 0)
+        up_left = self._shifted_image(above, 1, 0)
+        
+        # Операции ImageChops насыщаются в 0..255:
+        # прогноз < 0, если up_left > min(left + up, 255);
+        # прогноз > 255, если max(left - up_left, 0) > 255 - up
+        below_zero = ImageChops.subtract(up_left, ImageChops.add(left, above))
+        above_max = ImageChops.subtract(ImageChops.subtract(left, up_left), ImageChops.invert(above))
+        bbox = ImageChops.lighter(below_zero, above_max).getbbox()
+        return None if bbox is None else bbox[1]
+    
+    def _gradient_exact_row(self, diff: bytes, up: bytes) -> bytes:
+        """Побайтное декодирование строки gradient фильтра (up - строка выше)."""
+        row = bytearray(len(diff))
+        for channel in range(3):
+            left = up_left = 0
+            for i in range(channel, len(diff), 3):
+                up_value = up[i]
+                predicted = left + up_value - up_left
+                if predicted < 0:
+                    predicted = 0
+                elif predicted > 255:
+                    predicted = 255
+                left = row[i] = (predicted + diff[i]) & 0xFF
+                up_left = up_value
+        return bytes(row)
+    
+    def _shifted_image(self, image: Image.Image, dx: int, dy: int) -> Image.Image:
+        """Изображение, сдвинутое вправо/вниз, с заполнением освободившейся части нулями."""
+        w, h = image.size
+        shifted = Image.new(image.mode, (w, h))
+        shifted.paste(image.crop((0, 0, w - dx, h - dy)), (dx, dy))
+        return shifted
+    
+    def _cpixels_to_rgb_palette(self, palette: bytes, cpixel_size: int) -> list:
+        """Преобразование палитры CPIXEL (BGR[X]) в плоский список RGB для putpalette."""
+        rgb = []
+        for i in range(0, len(palette), cpixel_size):
+            rgb.extend(self._pixel_to_rgb(palette[i:i + cpixel_size]))
+        return rgb
+    
+    def _handle_desktop_size(self, w: int, h: int):
+        """Обработка pseudo-encoding DesktopSize (смена разрешения сервера)."""
+        logger.info("Desktop size changed: %sx%s", w, h)
+        self.screen_width, self.screen_height = w, h
+        self._rebuild_update_requests()
+        self.framebuffer = Image.new('RGB', (w, h))
+        self.after(0, self._update_scale_factor)
+        self.after(0, lambda: self.resolution_label.configure(text=f"{w}x{h}"))
     
     def _handle_copyrect_fast(self, x: int, y: int, w: int, h: int):
         """Быстрая обработка COPYRECT."""
-        src_data = self._recv_exact(4)
-        src_x, src_y = struct.unpack("!HH", src_data)
+        src_x, src_y = self._recv_struct(self._U16_PAIR)
         
-        # Быстрое копирование
-        rect = self.framebuffer.crop((src_x, src_y, src_x + w, src_y + h))
-        self.framebuffer.paste(rect, (x, y))
+        # Копирование на то же место ничего не меняет
+        if src_x == x and src_y == y:
+            return
+        
+        if src_x + w > self.screen_width or src_y + h > self.screen_height:
+            logger.warning("CopyRect source out of bounds: %s,%s %sx%s", src_x, src_y, w, h)
+            return
+        
+        # Быстрое копирование внутри framebuffer: crop/paste - построчный
+        # memcpy в libImaging; crop создает копию, поэтому перекрывающиеся
+        # области копируются корректно
+        framebuffer = self.framebuffer
+        framebuffer.paste(framebuffer.crop((src_x, src_y, src_x + w, src_y + h)), (x, y))
     
     def _handle_colormap_entries_fast(self):
         """Быстрая обработка colormap."""
         self._recv_exact(1)  # padding
-        first_color = struct.unpack("!H", self._recv_exact(2))[0]
-        num_colors = struct.unpack("!H", self._recv_exact(2))[0]
+        first_color = self._recv_struct(self._U16)[0]
+        num_colors = self._recv_struct(self._U16)[0]
         self._recv_exact(num_colors * 6)  # Пропускаем данные цветов
     
     def _handle_server_cut_text_fast(self):
         """Быстрая обработка cut text."""
         self._recv_exact(3)  # padding
-        text_length = struct.unpack("!I", self._recv_exact(4))[0]
+        text_length = self._recv_struct(self._U32)[0]
         self._recv_exact(text_length)  # Пропускаем текст для производительности
     
     def _schedule_canvas_update_stable(self):
-        """СТАБИЛЬНОЕ планирование обновления canvas."""
-        current_time = time.time()
-        
-        # СТАБИЛЬНОСТЬ: Более консервативный throttling
-        if current_time - self.last_canvas_update < self.canvas_update_interval:
-            if not self.pending_canvas_update:
-                self.pending_canvas_update = True
-                delay = int((self.canvas_update_interval - (current_time - self.last_canvas_update)) * 1000)
-                self.after(max(16, delay), self._update_canvas_fast)  # Минимум 16ms (60 FPS)
-        else:
-            self._update_canvas_fast()
+        """Планирование перерисовки canvas на ближайшую idle-итерацию Tk.
+        
+        Все изменения, пришедшие до нее, выводятся одной перерисовкой.
+        Частоту кадров уже ограничивают запросы обновления к серверу,
+        поэтому отдельный таймер отрисовки не нужен.
+        """
+        if not self.pending_canvas_update:
+            self.pending_canvas_update = True
+            self.after_idle(self._update_canvas_fast)
     
     def _request_framebuffer_update_stable(self, incremental: bool = True):
         """СТАБИЛЬНЫЙ запрос обновления framebuffer."""
         if not self.connected or not self.socket:
             return
         
-        current_time = time.time()
+        current_time = time.monotonic()
         
         # СТАБИЛЬНОСТЬ: Более строгий throttling
         if current_time - self.last_update_request_time < self.update_request_interval:
@@ -1014,7 +1728,7 @@ class VNCViewerFrame(ctk.CTkFrame):
             # Проверяем на зависшие запросы
             time_since_response = current_time - self.last_server_response_time
             if time_since_response > 3.0:  # 3 секунды без ответа
-                logger.warning(f"Resetting pending requests after {time_since_response:.1f}s timeout")
+                logger.warning("Resetting pending requests after %.1fs timeout", time_since_response)
                 self.pending_update_requests = 0
             else:
                 return
@@ -1030,23 +1744,16 @@ class VNCViewerFrame(ctk.CTkFrame):
             if not socket_valid:
                 return
             
-            message = struct.pack(
-                "!BBHHHH",
-                self.FRAMEBUFFER_UPDATE_REQUEST,
-                1 if incremental else 0,
-                0, 0,
-                self.screen_width, self.screen_height
-            )
-            
-            self.socket.send(message)
+            self.socket.sendall(self._update_request_incremental if incremental
+                                else self._update_request_full)
             self.pending_update_requests += 1
             self.last_update_request_time = current_time
             
         except (OSError, socket.error) as e:
-            logger.debug(f"Socket error in stable update request: {e}")
+            logger.debug("Socket error in stable update request: %s", e)
             self.pending_update_requests = 0
         except Exception as e:
-            logger.error(f"Error in stable update request: {e}")
+            logger.error("Error in stable update request: %s", e)
             self.pending_update_requests = 0
     
     def _update_canvas_fast(self):
@@ -1056,49 +1763,49 @@ class VNCViewerFrame(ctk.CTkFrame):
         
         try:
             self.pending_canvas_update = False
-            self.last_canvas_update = time.time()
             
             # ИСПРАВЛЕНИЕ: Избегаем моргания экрана
-            display_image = self.framebuffer
+            framebuffer = self.framebuffer
+            dirty_rects, rendered = self._take_dirty_region()
             
             # Применяем масштабирование только если необходимо
-            scale_value = self.scale_var.get()
-            if scale_value != "100%":
-                scale_factor = self._get_scale_factor(scale_value)
-                if scale_factor != 1.0:
-                    new_width = int(self.screen_width * scale_factor)
-                    new_height = int(self.screen_height * scale_factor)
-                    display_image = self.framebuffer.resize((new_width, new_height), Image.NEAREST)
-            
-            # ИСПРАВЛЕНИЕ: Создаем PhotoImage
-            photo = ImageTk.PhotoImage(display_image)
-            
-            # ИСПРАВЛЕНИЕ: Умное обновление canvas без полной очистки
-            canvas_items = self.canvas.find_all()
-            
-            if canvas_items:
-                # Обновляем существующее изображение
-                main_image_item = canvas_items[0]
-                self.canvas.itemconfig(main_image_item, image=photo)
+            scale_factor = self._scale_factor
+            if scale_factor != 1.0:
+                size = (int(self.screen_width * scale_factor), int(self.screen_height * scale_factor))
             else:
-                # Создаем новое изображение только если его нет
-                self.canvas.create_image(0, 0, anchor="nw", image=photo, tags="main_image")
-            
-            # Сохраняем ссылку на изображение
-            self.canvas.image = photo
+                size = framebuffer.size
+            self._display_size = size
+            
+            photo = self._tk_image
+            if dirty_rects and photo is not None and (photo.width(), photo.height()) == size:
+                # Размер не менялся: выводим только измененные области,
+                # по возможности уже подготовленные потоком приёма
+                if rendered is None or any(region[0] != size for region in rendered):
+                    rendered = self._render_regions(dirty_rects, size)
+                for _, patch, x, y in rendered:
+                    self._paste_photo_region(patch, x, y)
+            elif size == framebuffer.size:
+                self._show_display_image(framebuffer)
+            else:
+                self._show_display_image(self._scaled_framebuffer(size))
             
-            # Обновляем размер scroll region
-            self.canvas.configure(scrollregion=(0, 0, display_image.width, display_image.height))
+            # Индикатор активности: зажигается один раз на серию кадров
+            if self._activity_timer is None:
+                self.activity_indicator.configure(text="🟢")
+                self._activity_timer = self.after(100, self._reset_activity_indicator)
             
-            # Индикатор активности
-            self.activity_indicator.configure(text="🟢")
-            self.after(100, lambda: self.activity_indicator.configure(text="⚫"))
+            self.frame_count += 1
             
         except Exception as e:
-            logger.error(f"Stable canvas update error: {e}")
+            logger.error("Stable canvas update error: %s", e)
             # При ошибке делаем полное обновление
             self._full_canvas_refresh()
     
+    def _reset_activity_indicator(self):
+        """Гашение индикатора активности."""
+        self._activity_timer = None
+        self.activity_indicator.configure(text="⚫")
+    
     def _full_canvas_refresh(self):
         """Полное обновление canvas при ошибках."""
         try:
@@ -1107,22 +1814,128 @@ class VNCViewerFrame(ctk.CTkFrame):
             
             # Полная очистка только при необходимости
             self.canvas.delete("all")
+            self._tk_image = None
+            self._canvas_image_id = None
             
             display_image = self.framebuffer
-            scale_factor = self._get_scale_factor(self.scale_var.get())
+            scale_factor = self._scale_factor
             
             if scale_factor != 1.0:
                 new_width = int(self.screen_width * scale_factor)
                 new_height = int(self.screen_height * scale_factor)
-                display_image = self.framebuffer.resize((new_width, new_height), Image.NEAREST)
+                display_image = self._scaled_framebuffer((new_width, new_height))
             
-            photo = ImageTk.PhotoImage(display_image)
-            self.canvas.create_image(0, 0, anchor="nw", image=photo, tags="main_image")
-            self.canvas.image = photo
-            self.canvas.configure(scrollregion=(0, 0, display_image.width, display_image.height))
+            self._show_display_image(display_image)
             
         except Exception as e:
-            logger.error(f"Full canvas refresh error: {e}")
+            logger.error("Full canvas refresh error: %s", e)
+    
+    def _show_display_image(self, display_image: Image.Image):
+        """Вывод изображения через постоянное PhotoImage.
+        
+        PhotoImage пересоздается только при смене размера, в остальных
+        случаях пиксели копируются в уже существующее изображение.
+        """
+        photo = self._tk_image
+        if photo is not None and (photo.width(), photo.height()) == display_image.size:
+            photo.paste(display_image)
+            return
+        
+        self._tk_image = ImageTk.PhotoImage(display_image)
+        if self._canvas_image_id is None:
+            self._canvas_image_id = self.canvas.create_image(
+                0, 0, anchor="nw", image=self._tk_image, tags="main_image"
+            )
+        else:
+            self.canvas.itemconfig(self._canvas_image_id, image=self._tk_image)
+        
+        # Обновляем размер scroll region
+        self.canvas.configure(scrollregion=(0, 0, display_image.width, display_image.height))
+    
+    def _paste_photo_region(self, patch: Image.Image, x: int, y: int):
+        """Копирование области в постоянное PhotoImage (Tk перерисует только ее).
+        
+        PhotoImage.paste пишет только с начала изображения, поэтому область
+        выводится через промежуточное PhotoImage того же размера, которое
+        переиспользуется между кадрами.
+        """
+        photos = self._patch_photos
+        patch_photo = photos.get(patch.size)
+        if patch_photo is not None:
+            photos.move_to_end(patch.size)
+            patch_photo.paste(patch)
+        else:
+            patch_photo = ImageTk.PhotoImage(patch)
+            photos[patch.size] = patch_photo
+            if len(photos) > self.PATCH_PHOTO_CACHE_SIZE:
+                photos.popitem(last=False)
+        self.canvas.tk.call(str(self._tk_image), 'copy', str(patch_photo), '-to', x, y)
+    
+    def _scaled_framebuffer(self, size: Tuple[int, int]) -> Image.Image:
+        """Весь экран в масштабе вывода, из тех же тайлов, что и отдельные области."""
+        region = self._render_region((0, 0) + self.framebuffer.size, size[0], size[1])
+        if region is None:
+            return self.framebuffer.resize(size, Image.NEAREST)
+        return region[1]
+    
+    def _render_regions(self, dirty_rects: list, size: Tuple[int, int]) -> list:
+        """Изображения всех непустых измененных областей для вывода размером size."""
+        rendered = []
+        for dirty in dirty_rects:
+            region = self._render_region(dirty, size[0], size[1])
+            if region is not None:
+                rendered.append(region)
+        return rendered
+    
+    def _render_region(self, dirty: Tuple[int, int, int, int], width: int, height: int) -> Optional[tuple]:
+        """Изображение измененной области для вывода размером width x height.
+        
+        Масштабированный вывод всегда строится из одних и тех же тайлов
+        сетки SCALE_TILE_SIZE: resize одного тайла детерминирован, поэтому
+        перерисованная область совпадает пиксель в пиксель с остальным
+        изображением (resize произвольного box дает другое округление NEAREST).
+        
+        Returns:
+            ((width, height), patch, x, y) или None для пустой области.
+        """
+        framebuffer = self.framebuffer
+        if (width, height) == framebuffer.size:
+            return (width, height), framebuffer.crop(dirty), dirty[0], dirty[1]
+        
+        ratio_x = framebuffer.width / width
+        ratio_y = framebuffer.height / height
+        tile = self.SCALE_TILE_SIZE
+        
+        # Область вывода (с запасом в пиксель на округление), выровненная по сетке тайлов
+        x1 = max(0, int(dirty[0] / ratio_x) - 1) // tile * tile
+        y1 = max(0, int(dirty[1] / ratio_y) - 1) // tile * tile
+        x2 = min(width, math.ceil(dirty[2] / ratio_x) + 1)
+        y2 = min(height, math.ceil(dirty[3] / ratio_y) + 1)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        x2 = min(width, -(-x2 // tile) * tile)
+        y2 = min(height, -(-y2 // tile) * tile)
+        
+        patch = Image.new('RGB', (x2 - x1, y2 - y1))
+        for tile_y in range(y1, y2, tile):
+            tile_h = min(tile, height - tile_y)
+            for tile_x in range(x1, x2, tile):
+                tile_w = min(tile, width - tile_x)
+                patch.paste(framebuffer.resize(
+                    (tile_w, tile_h), Image.NEAREST,
+                    box=(tile_x * ratio_x, tile_y * ratio_y,
+                         (tile_x + tile_w) * ratio_x, (tile_y + tile_h) * ratio_y)
+                ), (tile_x - x1, tile_y - y1))
+        return (width, height), patch, x1, y1
+    
+    def _update_scale_factor(self):
+        """Пересчет кэшированного коэффициента масштабирования."""
+        if not self.screen_width or not self.screen_height:
+            return
+        
+        scale_factor = self._get_scale_factor(self.scale_var.get())
+        self._scale_factor = scale_factor
+        self._inv_scale_factor = 1.0 / scale_factor
     
     def _get_scale_factor(self, scale_value: str) -> float:
         """Получение коэффициента масштабирования."""
@@ -1147,7 +1960,7 @@ class VNCViewerFrame(ctk.CTkFrame):
             return b''
         
         if size > 100000000:  # 100MB лимит для поддержки больших экранов
-            logger.error(f"Requested size too large: {size}")
+            logger.error("Requested size too large: %s", size)
             raise ValueError(f"Size too large: {size}")
         
         if not self.socket:
@@ -1161,29 +1974,25 @@ class VNCViewerFrame(ctk.CTkFrame):
         if not socket_valid:
             raise ConnectionError("Socket closed")
         
-        data = b''
-        remaining = size
-        max_chunk_size = 65536  # 64KB chunks
+        # Большие блоки читаются через recv_into прямо в итоговый буфер
+        if size > self.RECV_CHUNK_SIZE:
+            return self._recv_large(size)
         
-        while remaining > 0:
+        while self._rx_tail - self._rx_head < size:
             try:
-                chunk_size = min(remaining, max_chunk_size)
-                chunk = self.socket.recv(chunk_size)
-                
-                if not chunk:
-                    if len(data) > 0:
-                        logger.warning(f"Partial data received: {len(data)}/{size} bytes")
-                    raise ConnectionError(f"Connection closed (expected {size}, got {len(data)})")
-                
-                data += chunk
-                remaining -= len(chunk)
+                if not self._fill_rx_buffer():
+                    available = self._rx_tail - self._rx_head
+                    if available > 0:
+                        logger.warning("Partial data received: %s/%s bytes", available, size)
+                    raise ConnectionError(f"Connection closed (expected {size}, got {available})")
                 
             except socket.timeout:
-                if len(data) > 0:
-                    logger.warning(f"Timeout while reading, got {len(data)}/{size} bytes")
+                available = self._rx_tail - self._rx_head
+                if available > 0:
+                    logger.warning("Timeout while reading, got %s/%s bytes", available, size)
                 # Для UltraVNC расширений - можем продолжить с частичными данными
                 if size < 1000:  # Небольшие расширения
-                    logger.debug(f"Timeout on small read ({size} bytes), continuing")
+                    logger.debug("Timeout on small read (%s bytes), continuing", size)
                     break
                 else:
                     raise
@@ -1195,40 +2004,152 @@ class VNCViewerFrame(ctk.CTkFrame):
                 else:
                     raise ConnectionError(f"Socket error: {e}")
         
+        head = self._rx_head
+        end = min(head + size, self._rx_tail)
+        self._rx_head = end
+        return bytes(self._rx_view[head:end])
+    
+    def _recv_struct(self, fmt: struct.Struct) -> tuple:
+        """Чтение структуры через unpack_from прямо из приёмного буфера."""
+        head = self._rx_head
+        if self._rx_tail - head < fmt.size:
+            # Данных в буфере мало - дочитываем через _recv_exact
+            return fmt.unpack(self._recv_exact(fmt.size))
+        self._rx_head = head + fmt.size
+        return fmt.unpack_from(self._rx_buf, head)
+    
+    def _recv_large(self, size: int) -> bytearray:
+        """Чтение большого блока в заранее выделенный bytearray.
+        
+        Данные не проходят через приёмный буфер: каждый recv_into пишет
+        сразу на свое место, без промежуточных bytes и срезов.
+        """
+        head = self._rx_head
+        offset = min(self._rx_tail - head, size)
+        data = bytearray(size)
+        
+        with memoryview(data) as view:
+            view[:offset] = self._rx_view[head:head + offset]
+            self._rx_head = head + offset
+            try:
+                while offset < size:
+                    received = self.socket.recv_into(view[offset:])
+                    if not received:
+                        raise ConnectionError(f"Connection closed (expected {size}, got {offset})")
+                    offset += received
+            except socket.timeout:
+                # Полученная часть возвращается в буфер, чтобы не нарушить поток
+                logger.warning("Timeout while reading, got %s/%s bytes", offset, size)
+                self._reset_rx_buffer(max(self.RX_BUFFER_SIZE, offset + self.RECV_CHUNK_SIZE))
+                self._rx_view[:offset] = view[:offset]
+                self._rx_tail = offset
+                raise
+            except ConnectionError:
+                raise
+            except OSError as e:
+                raise ConnectionError(f"Socket error: {e}")
+        
+        # Linux сбрасывает TCP_QUICKACK после нескольких сегментов;
+        # восстанавливаем его после крупной передачи
+        if self._quickack:
+            try:
+                self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            except OSError:
+                self._quickack = False
+        
         return data
     
+    def _fill_rx_buffer(self) -> bool:
+        """Чтение очередного блока из сокета в приёмный буфер.
+        
+        Returns:
+            False если сервер закрыл соединение
+        """
+        head, tail = self._rx_head, self._rx_tail
+        if head == tail:
+            head = tail = 0
+        elif len(self._rx_buf) - tail < self.RECV_CHUNK_SIZE:
+            # Непрочитанный остаток сдвигается в начало буфера
+            self._rx_buf[:tail - head] = self._rx_buf[head:tail]
+            head, tail = 0, tail - head
+        self._rx_head, self._rx_tail = head, tail
+        
+        received = self.socket.recv_into(self._rx_view[tail:])
+        if not received:
+            return False
+        self._rx_tail = tail + received
+        return True
+    
+    def _reset_rx_buffer(self, capacity: int = RX_BUFFER_SIZE):
+        """Создание пустого приёмного буфера.
+        
+        Данные лежат в _rx_buf между _rx_head и _rx_tail; чтение сдвигает
+        только индекс, без удаления байт из начала буфера.
+        """
+        self._rx_buf = bytearray(capacity)
+        self._rx_view = memoryview(self._rx_buf)
+        self._rx_head = 0
+        self._rx_tail = 0
+    
     def _start_event_processor(self):
-        """Запуск быстрого обработчика событий."""
+        """Запуск быстрого обработчика событий.
+        
+        Очередь разбирается по виртуальному событию <<VNCEvents>>,
+        которое генерирует _push_event, без периодического опроса.
+        """
+        self.bind("<<VNCEvents>>", lambda event: self._process_events_fast())
         self._process_events_fast()
     
     def _process_events_fast(self):
         """БЫСТРАЯ обработка событий из очереди."""
+        self._events_signaled = False
+        
+        # Флаг сбрасывается до отрисовки: изменения после него вызовут новую
+        if self._display_pending:
+            self._display_pending = False
+            self._schedule_canvas_update_stable()
+        
         try:
             events_processed = 0
             max_events = 10  # Обрабатываем больше событий за раз
             
             while events_processed < max_events:
-                event_type, data = self.update_queue.get_nowait()
+                event_type, data = self.update_queue.popleft()
                 
-                if event_type == 'update_display':
-                    self._update_canvas_fast()
-                elif event_type == 'update_status':
+                if event_type == 'update_status':
                     self.status_label.configure(text=data)
                 
                 events_processed += 1
                     
-        except queue.Empty:
-            pass
+        except IndexError:
+            return
+        
+        # Остаток очереди разбираем на следующей idle-итерации
+        self.after_idle(self._process_events_fast)
+    
+    def _push_event(self, event_type: str, data: Any = None):
+        """Неблокирующая отправка события в UI поток.
         
-        # ПРОИЗВОДИТЕЛЬНОСТЬ: Быстрая обработка событий (120 FPS)
-        self.after(8, self._process_events_fast)
+        При переполнении очереди выбрасывается самое старое событие,
+        чтобы поток приёма никогда не ждал UI.
+        """
+        self.update_queue.append((event_type, data))
+        self._wake_ui()
+    
+    def _wake_ui(self):
+        """Пробуждение UI потока через <<VNCEvents>>."""
+        # Одно событие на пачку, а не на каждую запись
+        if not self._events_signaled:
+            self._events_signaled = True
+            try:
+                self.event_generate("<<VNCEvents>>", when="tail")
+            except Exception:
+                # Виджет уничтожен или mainloop уже остановлен
+                self._events_signaled = False
     
     def _update_status(self, status: str):
         """Обновление статуса."""
-        try:
-            self.update_queue.put_nowait(('update_status', status))
-        except queue.Full:
-            pass  # Пропускаем если очередь заполнена
+        self._push_event('update_status', status)
     
     def _on_connected(self):
         """Обработчик успешного подключения."""
@@ -1243,11 +2164,25 @@ class VNCViewerFrame(ctk.CTkFrame):
         
         # Фокус на canvas
         self.canvas.focus_set()
+        
+        # Запуск обновления статистики (цикл от прошлого подключения
+        # мог еще не заметить отключение)
+        if self._stats_timer is not None:
+            self.after_cancel(self._stats_timer)
+        self.last_fps_time = self.last_update_count_time = time.monotonic()
+        self.frame_count = 0
+        self._stats_update_count = self.update_count
+        self._stats_next_deadline = self.last_fps_time + 1.0
+        self._stats_timer = self.after(1000, self._update_stats)
     
     def _on_connection_failed(self, error: str):
         """Обработчик неудачного подключения."""
         messagebox.showerror("Ошибка подключения", f"Не удалось подключиться:\n{error}")
     
+    def _on_connection_lost(self, error: str):
+        """Обработчик разрыва соединения из-за ошибки протокола."""
+        messagebox.showerror("Ошибка VNC", f"Соединение разорвано:\n{error}")
+    
     def disconnect_from_vnc(self):
         """Отключение от VNC сервера."""
         logger.info("Disconnecting from VNC server...")
@@ -1255,14 +2190,10 @@ class VNCViewerFrame(ctk.CTkFrame):
         self.connected = False
         self._stop_threads.set()
         
-        # Останавливаем таймеры
-        if self.force_update_timer:
-            self.after_cancel(self.force_update_timer)
-            self.force_update_timer = None
-        
-        if self.continuous_update_timer:
-            self.after_cancel(self.continuous_update_timer)
-            self.continuous_update_timer = None
+        # Останавливаем таймер
+        if self.update_timer:
+            self.after_cancel(self.update_timer)
+            self.update_timer = None
         
         # Закрываем сокет
         if self.socket:
@@ -1283,12 +2214,16 @@ class VNCViewerFrame(ctk.CTkFrame):
             self.canvas.delete("all")
         except:
             pass
+        self._tk_image = None
+        self._canvas_image_id = None
+        self._patch_photos.clear()
         
         self.framebuffer = None
         
         # Сброс счетчиков
         self.frame_count = 0
         self.update_count = 0
+        self._stats_update_count = 0
         self.pending_update_requests = 0
         self.protocol_errors = 0
         
@@ -1304,6 +2239,7 @@ class VNCViewerFrame(ctk.CTkFrame):
             self.fps_label.configure(text="")
             self.ups_label.configure(text="")
             self.last_update_label.configure(text="")  # НОВОЕ: Очистка framebuffer статуса
+            self._label_texts.clear()
         except:
             pass
         
@@ -1320,17 +2256,25 @@ class VNCViewerFrame(ctk.CTkFrame):
     
     def _on_mouse_motion(self, event):
         if self.connected and not self.view_only_var.get():
-            self._send_pointer_event_fast(event.x, event.y, button_mask=1)
+            self._queue_pointer_event(event.x, event.y, button_mask=1)
     
     def _on_mouse_move(self, event):
         if self.connected and not self.view_only_var.get():
-            # ПРОИЗВОДИТЕЛЬНОСТЬ: Throttling для движения мыши
-            current_time = time.time()
-            if hasattr(self, '_last_mouse_move_time'):
-                if current_time - self._last_mouse_move_time < 0.02:  # 50 FPS
-                    return
-            self._last_mouse_move_time = current_time
-            self._send_pointer_event_fast(event.x, event.y, button_mask=0)
+            self._queue_pointer_event(event.x, event.y, button_mask=0)
+    
+    def _queue_pointer_event(self, x: int, y: int, button_mask: int):
+        """Движение мыши: запоминаем последнюю позицию, отправка раз в POINTER_FLUSH_INTERVAL."""
+        self._pending_pointer = (x, y, button_mask)
+        if not self._pointer_flush_scheduled:
+            self._pointer_flush_scheduled = True
+            self.after(self.POINTER_FLUSH_INTERVAL, self._flush_pointer_event)
+    
+    def _flush_pointer_event(self):
+        """Отправка последнего отложенного PointerEvent."""
+        self._pointer_flush_scheduled = False
+        pending = self._pending_pointer
+        if pending is not None:
+            self._send_pointer_event_fast(*pending)
     
     def _on_right_click(self, event):
         if self.connected and not self.view_only_var.get():
@@ -1343,32 +2287,38 @@ class VNCViewerFrame(ctk.CTkFrame):
     def _on_mouse_wheel(self, event):
         if self.connected and not self.view_only_var.get():
             button_mask = 8 if event.delta > 0 else 16
-            self._send_pointer_event_fast(event.x, event.y, button_mask=button_mask)
-            self.after(10, lambda: self._send_pointer_event_fast(event.x, event.y, button_mask=0))
+            self._send_pointer_event_fast(event.x, event.y, button_mask=button_mask, release=True)
     
-    def _send_pointer_event_fast(self, x: int, y: int, button_mask: int):
-        """БЫСТРАЯ отправка события указателя."""
+    def _send_pointer_event_fast(self, x: int, y: int, button_mask: int, release: bool = False):
+        """БЫСТРАЯ отправка события указателя.
+        
+        Args:
+            release: сразу отпустить кнопки тем же sendall (щелчок колесом)
+        """
+        # Отправляемое событие заменяет отложенное движение
+        self._pending_pointer = None
         if not self.connected or not self.socket:
             return
         
         try:
-            if self.socket.fileno() == -1:
-                return
-            
             # Преобразуем координаты с учетом масштабирования
-            scale_factor = self._get_scale_factor(self.scale_var.get())
-            real_x = int(x / scale_factor)
-            real_y = int(y / scale_factor)
+            inv_scale = self._inv_scale_factor
+            real_x = int(x * inv_scale)
+            real_y = int(y * inv_scale)
             
             real_x = max(0, min(real_x, self.screen_width - 1))
             real_y = max(0, min(real_y, self.screen_height - 1))
             
-            message = struct.pack("!BBHH", self.POINTER_EVENT, button_mask, real_x, real_y)
-            self.socket.send(message)
+            message = self._POINTER_EVENT.pack(self.POINTER_EVENT, button_mask, real_x, real_y)
+            if release:
+                message += self._POINTER_EVENT.pack(self.POINTER_EVENT, 0, real_x, real_y)
             
-            # ПРОИЗВОДИТЕЛЬНОСТЬ: Запрос обновления только при кликах
-            if button_mask != 0 and self.pending_update_requests < 2:
-                self._request_framebuffer_update_fast(incremental=True)
+            # ПРОИЗВОДИТЕЛЬНОСТЬ: Запрос обновления только при кликах,
+            # в том же sendall, что и само событие
+            request = self._input_update_request() if button_mask != 0 else b''
+            self.socket.sendall(message + request)
+            if request:
+                self._update_request_sent()
             
         except (OSError, socket.error):
             pass
@@ -1389,19 +2339,9 @@ class VNCViewerFrame(ctk.CTkFrame):
     
     def _get_keysym(self, event) -> Optional[int]:
         """Получение keysym для клавиши."""
-        special_keys = {
-            'Return': 0xff0d, 'Escape': 0xff1b, 'BackSpace': 0xff08, 'Tab': 0xff09,
-            'space': 0x0020, 'Delete': 0xffff, 'Home': 0xff50, 'End': 0xff57,
-            'Prior': 0xff55, 'Next': 0xff56, 'Left': 0xff51, 'Up': 0xff52,
-            'Right': 0xff53, 'Down': 0xff54, 'F1': 0xffbe, 'F2': 0xffbf,
-            'F3': 0xffc0, 'F4': 0xffc1, 'F5': 0xffc2, 'F6': 0xffc3,
-            'F7': 0xffc4, 'F8': 0xffc5, 'F9': 0xffc6, 'F10': 0xffc7,
-            'F11': 0xffc8, 'F12': 0xffc9, 'Shift_L': 0xffe1, 'Shift_R': 0xffe2,
-            'Control_L': 0xffe3, 'Control_R': 0xffe4, 'Alt_L': 0xffe9, 'Alt_R': 0xffea,
-        }
-        
-        if event.keysym in special_keys:
-            return special_keys[event.keysym]
+        keysym = _KEYSYM_MAP.get(event.keysym)
+        if keysym is not None:
+            return keysym
         
         if len(event.char) == 1 and ord(event.char) < 256:
             return ord(event.char)
@@ -1414,48 +2354,71 @@ class VNCViewerFrame(ctk.CTkFrame):
             return
         
         try:
-            if self.socket.fileno() == -1:
-                return
-            
-            message = struct.pack("!BxBBxxxI", self.KEY_EVENT, 1 if down else 0, 0, keysym)
-            self.socket.send(message)
+            # KeyEvent: type, down-flag, 2 байта padding, keysym (8 байт)
+            message = self._KEY_EVENT.pack(self.KEY_EVENT, 1 if down else 0, keysym)
             
             # ПРОИЗВОДИТЕЛЬНОСТЬ: Запрос обновления только при нажатии
-            if down and self.pending_update_requests < 2:
-                self._request_framebuffer_update_fast(incremental=True)
+            request = self._input_update_request() if down else b''
+            self.socket.sendall(message + request)
+            if request:
+                self._update_request_sent()
             
         except (OSError, socket.error):
             pass
         except Exception:
             pass
     
+    def _send_key_sequence(self, events):
+        """Отправка последовательности KeyEvent одним sendall.
+        
+        События RFB обрабатываются сервером строго по порядку, поэтому
+        нажатия и отпускания собираются в один буфер без задержек между ними.
+        """
+        if not self.connected or not self.socket:
+            return
+        
+        pack = self._KEY_EVENT.pack
+        message = b''.join(pack(self.KEY_EVENT, 1 if down else 0, keysym)
+                           for keysym, down in events)
+        try:
+            request = self._input_update_request()
+            self.socket.sendall(message + request)
+            if request:
+                self._update_request_sent()
+            
+        except (OSError, socket.error):
+            pass
+    
     # Специальные команды (упрощенные)
     def _send_ctrl_alt_del(self):
         if not self.connected or self.view_only_var.get():
             return
         
-        self._send_key_event_fast(0xffe3, True)   # Ctrl down
-        self._send_key_event_fast(0xffe9, True)   # Alt down
-        self._send_key_event_fast(0xffff, True)   # Del down
-        self.after(50, lambda: self._send_key_event_fast(0xffff, False))
-        self.after(100, lambda: self._send_key_event_fast(0xffe9, False))
-        self.after(150, lambda: self._send_key_event_fast(0xffe3, False))
+        self._send_key_sequence((
+            (0xffe3, True),    # Ctrl down
+            (0xffe9, True),    # Alt down
+            (0xffff, True),    # Del down
+            (0xffff, False),   # Del up
+            (0xffe9, False),   # Alt up
+            (0xffe3, False),   # Ctrl up
+        ))
     
     def _send_alt_tab(self):
         if not self.connected or self.view_only_var.get():
             return
         
-        self._send_key_event_fast(0xffe9, True)   # Alt down
-        self._send_key_event_fast(0xff09, True)   # Tab down
-        self.after(50, lambda: self._send_key_event_fast(0xff09, False))
-        self.after(100, lambda: self._send_key_event_fast(0xffe9, False))
+        self._send_key_sequence((
+            (0xffe9, True),    # Alt down
+            (0xff09, True),    # Tab down
+            (0xff09, False),   # Tab up
+            (0xffe9, False),   # Alt up
+        ))
     
     def _send_escape(self):
         if not self.connected or self.view_only_var.get():
             return
         
-        self._send_key_event_fast(0xff1b, True)
-        self.after(50, lambda: self._send_key_event_fast(0xff1b, False))
+        self._send_key_sequence(((0xff1b, True), (0xff1b, False)))
     
     def _take_screenshot(self):
         """Создание скриншота."""
@@ -1480,25 +2443,13 @@ class VNCViewerFrame(ctk.CTkFrame):
     
     def _on_quality_change(self, value):
         """Изменение режима производительности."""
-        logger.info(f"Quality mode changed to: {value}")
-        
-        if value == "Производительность":
-            self.update_request_interval = 0.025       # 40 FPS (более стабильно)
-            self.canvas_update_interval = 0.025        # 40 FPS
-            self.continuous_update_interval = 0.033    # 30 FPS continuous
-            self.max_pending_requests = 2
-        elif value == "Сбалансированный":
-            self.update_request_interval = 0.033       # 30 FPS
-            self.canvas_update_interval = 0.033        # 30 FPS
-            self.continuous_update_interval = 0.05     # 20 FPS continuous
-            self.max_pending_requests = 2
-        else:  # Качество
-            self.update_request_interval = 0.05        # 20 FPS
-            self.canvas_update_interval = 0.025        # 40 FPS для UI
-            self.continuous_update_interval = 0.1      # 10 FPS continuous
-            self.max_pending_requests = 1
-        
-        logger.info(f"Performance settings updated: intervals={self.update_request_interval:.3f}s, max_pending={self.max_pending_requests}")
+        logger.info("Quality mode changed to: %s", value)
+        
+        (self.update_request_interval,
+         self.continuous_update_interval,
+         self.max_pending_requests) = self._QUALITY_PROFILES.get(value, self._QUALITY_PROFILES["Качество"])
+        
+        logger.info("Performance settings updated: intervals=%.3fs, max_pending=%s", self.update_request_interval, self.max_pending_requests)
         
         # Перезапускаем таймеры с новыми настройками
         if self.connected:
@@ -1506,35 +2457,23 @@ class VNCViewerFrame(ctk.CTkFrame):
     
     def _restart_timers_with_new_settings(self):
         """Перезапуск таймеров с новыми настройками."""
-        # Останавливаем старые таймеры
-        if self.force_update_timer:
-            self.after_cancel(self.force_update_timer)
-            self.force_update_timer = None
-        if self.continuous_update_timer:
-            self.after_cancel(self.continuous_update_timer)
-            self.continuous_update_timer = None
+        # Останавливаем старый таймер
+        if self.update_timer:
+            self.after_cancel(self.update_timer)
+            self.update_timer = None
         
         # Сбрасываем pending при смене настроек
         self.pending_update_requests = 0
         
-        # Запускаем новые с обновленными интервалами
-        self.after(100, self._start_high_performance_timers)
+        # Запускаем новый с обновленными интервалами
+        self.update_timer = self.after(100, self._update_tick)
         
         logger.info("Timers restarted with new settings")
-        
-        # Перезапускаем таймеры с новыми настройками
-        if self.connected:
-            self._restart_timers_with_new_settings()
     
     def _on_continuous_change(self):
         """Обработка изменения режима непрерывных обновлений."""
         self.continuous_updates = self.continuous_var.get()
-        logger.info(f"Continuous updates: {'enabled' if self.continuous_updates else 'disabled'}")
-    
-    def _update_stats(self):
-        """Обновление статистики производительности."""
-        if not self.connected:
-            self.after(1000, self._update_stats)
+        logger.info("Continuous updates: %s", 'enabled' if self.continuous_updates else 'disabled')
     
     def _force_screen_refresh(self):
         """Принудительное обновление экрана для восстановления изображения."""
@@ -1554,42 +2493,64 @@ class VNCViewerFrame(ctk.CTkFrame):
             self.after(200, lambda: self._request_framebuffer_update_stable(incremental=True))
             
         except Exception as e:
-            logger.error(f"Error in force screen refresh: {e}")
+            logger.error("Error in force screen refresh: %s", e)
+            return
+    
+    def _update_stats(self):
+        """Обновление статистики производительности.
+        
+        Следующий запуск планируется от фиксированного дедлайна, поэтому
+        задержки цикла событий не накапливаются. После отключения цикл
+        останавливается и запускается снова в _on_connected.
+        """
+        if not self.connected:
             return
         
-        current_time = time.time()
+        current_time = time.monotonic()
+        
+        # Тик идет раз в секунду, поэтому счетчики делятся на фактически
+        # прошедшее время (таймер Tk может сработать на миллисекунду раньше)
         
         # FPS
-        if current_time - self.last_fps_time >= 1.0:
-            fps = self.frame_count / (current_time - self.last_fps_time)
-            self.fps_label.configure(text=f"FPS: {fps:.1f}")
-            self.frame_count = 0
-            self.last_fps_time = current_time
+        elapsed = max(1e-6, current_time - self.last_fps_time)
+        fps = self.frame_count / elapsed
+        self._set_label_text(self.fps_label, f"FPS: {fps:.1f}")
+        self.frame_count = 0
+        self.last_fps_time = current_time
         
         # UPS
-        if current_time - self.last_update_count_time >= 1.0:
-            ups = self.update_count / (current_time - self.last_update_count_time)
-            self.ups_label.configure(text=f"UPS: {ups:.1f}")
-            self.update_count = 0
-            self.last_update_count_time = current_time
+        elapsed = max(1e-6, current_time - self.last_update_count_time)
+        update_count = self.update_count
+        ups = (update_count - self._stats_update_count) / elapsed
+        self._set_label_text(self.ups_label, f"UPS: {ups:.1f}")
+        self._stats_update_count = update_count
+        self.last_update_count_time = current_time
         
         # НОВОЕ: Время последнего обновления framebuffer
-        if hasattr(self, 'last_framebuffer_time'):
-            time_since_fb = current_time - self.last_framebuffer_time
-            if time_since_fb < 1:
-                fb_status = "Live"
-                color = "green"
-            elif time_since_fb < 5:
-                fb_status = f"{time_since_fb:.1f}s ago"
-                color = "orange"
-            else:
-                fb_status = f"{time_since_fb:.0f}s ago"
-                color = "red"
-            
-            self.last_update_label.configure(text=f"Last FB: {fb_status}")
-            # Можно добавить цветовое кодирование если нужно
-        
-        self.after(1000, self._update_stats)
+        time_since_fb = current_time - self.last_framebuffer_time
+        if time_since_fb < 1:
+            fb_status = "Live"
+            color = "green"
+        elif time_since_fb < 5:
+            fb_status = f"{time_since_fb:.1f}s ago"
+            color = "orange"
+        else:
+            fb_status = f"{time_since_fb:.0f}s ago"
+            color = "red"
+        
+        self._set_label_text(self.last_update_label, f"Last FB: {fb_status}")
+        # Можно добавить цветовое кодирование если нужно
+        
+        # Следующий запуск - ровно через секунду после предыдущего дедлайна
+        self._stats_next_deadline = max(self._stats_next_deadline + 1.0, current_time)
+        delay_ms = int((self._stats_next_deadline - current_time) * 1000)
+        self._stats_timer = self.after(delay_ms, self._update_stats)
+    
+    def _set_label_text(self, label, text: str):
+        """Обновление текста метки только при его изменении (без лишних вызовов Tcl)."""
+        if self._label_texts.get(label) != text:
+            self._label_texts[label] = text
+            label.configure(text=text)
     
     def cleanup(self):
         """Очистка ресурсов."""
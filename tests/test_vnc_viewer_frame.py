@@ -0,0 +1,173 @@
+# tests/test_vnc_viewer_frame.py - Протокольные тесты VNCViewerFrame без дисплея
+import importlib.util
+import socket
+import struct
+import threading
+import unittest
+from collections import OrderedDict, deque
+from pathlib import Path
+
+# Модуль загружается по пути: gui/__init__.py тянет фреймы с зависимостями
+# только для Windows (pywin32), а просмотрщику VNC они не нужны
+_MODULE_PATH = Path(__file__).resolve().parent.parent / "gui" / "vnc_viewer_frame.py"
+_spec = importlib.util.spec_from_file_location("vnc_viewer_frame", _MODULE_PATH)
+vnc_viewer_frame = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(vnc_viewer_frame)
+VNCViewerFrame = vnc_viewer_frame.VNCViewerFrame
+
+
+def make_viewer(sock: socket.socket) -> VNCViewerFrame:
+    """Экземпляр без Tk: только состояние, нужное протокольному коду."""
+    viewer = VNCViewerFrame.__new__(VNCViewerFrame)
+    viewer.socket = sock
+    viewer.screen_width = viewer.screen_height = 0
+    viewer.pixel_format = None
+    viewer.framebuffer = None
+    viewer._reset_rx_buffer()
+    viewer._quickack = False
+    viewer.image_cache_enabled = True
+    viewer.image_cache = OrderedDict()
+    viewer.update_queue = deque(maxlen=3)
+    viewer._events_signaled = False
+    viewer._display_pending = False
+    viewer._dirty_rects = []
+    viewer._dirty_lock = threading.Lock()
+    viewer._display_size = None
+    viewer._prepared_region = None
+    viewer.pending_update_requests = 1
+    viewer._update_request_deferred = False
+    viewer.update_count = 0
+    viewer._rect_handlers = {
+        VNCViewerFrame.ENCODING_RAW: viewer._handle_raw_rectangle_stable,
+    }
+    # Вызовы Tk из протокольного кода в тестах не нужны
+    viewer.after = lambda *args, **kwargs: None
+    viewer._wake_ui = lambda: None
+    return viewer
+
+
+class InitializeAndDecodeTest(unittest.TestCase):
+    def setUp(self):
+        self.server, client = socket.socketpair()
+        self.addCleanup(self.server.close)
+        self.addCleanup(client.close)
+        self.viewer = make_viewer(client)
+
+    def test_raw_rectangle_after_initialize(self):
+        width, height = 4, 2
+        # ServerInit: размер, формат сервера (16 бит, отличается от клиентского), имя
+        server_format = struct.pack("!BBBBHHHBBBxxx", 16, 16, 0, 1, 31, 63, 31, 11, 5, 0)
+        name = b"test"
+        self.server.sendall(struct.pack("!HH", width, height) + server_format
+                            + struct.pack("!I", len(name)) + name)
+
+        self.assertTrue(self.viewer._initialize())
+
+        # Клиент отправил ClientInit, затем SetPixelFormat + SetEncodings + запрос
+        self.assertEqual(self.server.recv(1), b"\x01")
+        header = self.server.recv(20)
+        self.assertEqual(header, bytes((VNCViewerFrame.SET_PIXEL_FORMAT, 0, 0, 0))
+                         + VNCViewerFrame.CLIENT_PIXEL_FORMAT)
+        self.assertEqual(self.viewer.pixel_format['bytes_per_pixel'], 4)
+
+        # FramebufferUpdate с одним Raw прямоугольником 2x1 в BGRX
+        pixels = bytes((0, 0, 255, 0, 0, 255, 0, 0))  # красный, зеленый
+        self.server.sendall(
+            struct.pack("!BxH", VNCViewerFrame.FRAMEBUFFER_UPDATE, 1)
+            + struct.pack("!HHHHi", 1, 1, 2, 1, VNCViewerFrame.ENCODING_RAW)
+            + pixels
+        )
+        self.assertEqual(self.viewer._recv_exact(1)[0], VNCViewerFrame.FRAMEBUFFER_UPDATE)
+        self.viewer._handle_framebuffer_update_stable()
+
+        framebuffer = self.viewer.framebuffer
+        self.assertEqual(framebuffer.size, (width, height))
+        self.assertEqual(framebuffer.getpixel((1, 1)), (255, 0, 0))
+        self.assertEqual(framebuffer.getpixel((2, 1)), (0, 255, 0))
+        self.assertEqual(framebuffer.getpixel((0, 0)), (0, 0, 0))
+        self.assertEqual(self.viewer.update_count, 1)
+        self.assertEqual(self.viewer.pending_update_requests, 0)
+
+
+class DeferredUpdateRequestTest(unittest.TestCase):
+    def setUp(self):
+        self.server, client = socket.socketpair()
+        self.addCleanup(self.server.close)
+        self.addCleanup(client.close)
+        self.viewer = make_viewer(client)
+        self.viewer.connected = True
+        self.viewer.screen_width, self.viewer.screen_height = 4, 2
+        self.viewer._rebuild_update_requests()
+        self.viewer.after = lambda ms, func, *args: func(*args)
+        # Неотправленный запрос - ошибка теста, а не зависание
+        self.server.settimeout(1.0)
+
+    def test_deferred_request_ignores_throttle(self):
+        viewer = self.viewer
+        # Запрос только что отправлен: окно throttling еще открыто
+        viewer.update_request_interval = 60.0
+        viewer.last_update_request_time = vnc_viewer_frame.time.monotonic()
+        self.assertEqual(viewer._input_update_request(), b"")
+        self.assertTrue(viewer._update_request_deferred)
+
+        # Пустой FramebufferUpdate завершает текущий запрос
+        self.server.sendall(struct.pack("!BxH", VNCViewerFrame.FRAMEBUFFER_UPDATE, 0))
+        self.assertEqual(viewer._recv_exact(1)[0], VNCViewerFrame.FRAMEBUFFER_UPDATE)
+        viewer._handle_framebuffer_update_stable()
+
+        self.assertEqual(self.server.recv(64), viewer._update_request_incremental)
+        self.assertFalse(viewer._update_request_deferred)
+        self.assertEqual(viewer.pending_update_requests, 1)
+
+
+class UnknownMessageTest(unittest.TestCase):
+    def test_unknown_message_type_closes_connection(self):
+        server, client = socket.socketpair()
+        self.addCleanup(server.close)
+        self.addCleanup(client.close)
+        viewer = make_viewer(client)
+        viewer.connected = True
+        viewer._stop_threads = threading.Event()
+        viewer._update_status = lambda status: None
+        scheduled = []
+        viewer.after = lambda ms, func, *args: scheduled.append(func)
+
+        # Неизвестный тип, за ним корректный Bell - угадывать границу нельзя
+        server.sendall(bytes((200, VNCViewerFrame.BELL)))
+        receiver = threading.Thread(target=viewer._receive_loop_optimized, daemon=True)
+        receiver.start()
+        receiver.join(timeout=2.0)
+        viewer._stop_threads.set()
+
+        self.assertFalse(receiver.is_alive())
+        self.assertFalse(viewer.connected)
+        self.assertIn(viewer.disconnect_from_vnc, scheduled)
+        self.assertIn(viewer._on_connection_lost, scheduled)
+
+
+class TightGradientFilterTest(unittest.TestCase):
+    def decode(self, differences, width, height):
+        """Декодирование одноцветных (R = G = B) разностей, результат - значения каналов."""
+        viewer = VNCViewerFrame.__new__(VNCViewerFrame)
+        data = bytes(value for value in differences for _ in range(3))
+        image = viewer._tight_gradient_decode(data, width, height)
+        self.assertEqual(image.size, (width, height))
+        pixels = image.tobytes()
+        self.assertEqual(pixels[0::3], pixels[1::3])
+        self.assertEqual(pixels[0::3], pixels[2::3])
+        return list(pixels[0::3])
+
+    def test_decode_2x2(self):
+        self.assertEqual(self.decode([10, 5, 3, 1], 2, 2), [10, 15, 13, 19])
+
+    def test_prediction_clamped_to_255(self):
+        # Прогноз правого нижнего пикселя 255 + 250 - 10 ограничивается до 255
+        self.assertEqual(self.decode([10, 240, 245, 0], 2, 2), [10, 250, 255, 255])
+
+    def test_prediction_clamped_to_0(self):
+        # Прогноз правого нижнего пикселя 0 + 0 - 250 ограничивается до 0
+        self.assertEqual(self.decode([250, 6, 6, 0], 2, 2), [250, 0, 0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()